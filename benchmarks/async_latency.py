@@ -0,0 +1,76 @@
+"""
+Measures event-loop latency while concurrent tasks rearrange large arrays, with rearrange() called
+directly on the loop versus awaited through arearrange().
+
+A heartbeat task sleeps for --tick ms in a loop and records how late it wakes up; every blocking copy
+on the loop shows up as a late heartbeat. With arearrange() the copies run in an executor and the
+heartbeat lateness stays close to the idle baseline.
+
+Usage:
+    python benchmarks/async_latency.py [--tasks 8] [--requests 8] [--mb 64] [--threads 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rearrange import rearrange, arearrange, set_executor
+
+PATTERN = 'b h w c -> b (c h w)'
+
+async def heartbeat(tick, lateness, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lateness.append(time.perf_counter() - start - tick)
+
+async def blocking_worker(array, requests):
+    for _ in range(requests):
+        rearrange(array, PATTERN)
+        await asyncio.sleep(0)
+
+async def async_worker(array, requests):
+    for _ in range(requests):
+        await arearrange(array, PATTERN)
+
+async def run(worker, array, args):
+    lateness = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(args.tick / 1e3, lateness, stop))
+    start = time.perf_counter()
+    if worker is not None:
+        await asyncio.gather(*(worker(array, args.requests) for _ in range(args.tasks)))
+    else:
+        await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, np.array(lateness) * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=8, help="concurrent tasks issuing rearranges")
+    parser.add_argument('--requests', type=int, default=8, help="rearranges per task")
+    parser.add_argument('--mb', type=int, default=64, help="approximate input size in MB (float32)")
+    parser.add_argument('--threads', type=int, default=4, help="executor threads used by arearrange()")
+    parser.add_argument('--tick', type=float, default=1.0, help="heartbeat period in ms")
+    args = parser.parse_args()
+
+    n = int((args.mb * 1e6 / 4 / 16 / 8) ** 0.5)
+    array = np.random.rand(8, n, n, 16).astype(np.float32)
+    set_executor(ThreadPoolExecutor(max_workers=args.threads))
+    print(f"{PATTERN}  shape={array.shape}  {array.nbytes / 1e6:.0f} MB  "
+          f"{args.tasks} tasks x {args.requests} requests")
+    print(f"{'mode':<12} {'total s':>8} {'p50 late ms':>12} {'p99 late ms':>12} {'max late ms':>12}")
+    for name, worker in (('idle', None), ('rearrange', blocking_worker), ('arearrange', async_worker)):
+        elapsed, lateness = asyncio.run(run(worker, array, args))
+        print(f"{name:<12} {elapsed:8.2f} {np.percentile(lateness, 50):12.2f} "
+              f"{np.percentile(lateness, 99):12.2f} {lateness.max():12.2f}")
+
+if __name__ == '__main__':
+    main()
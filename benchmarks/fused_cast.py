@@ -0,0 +1,58 @@
+"""
+Compares rearrange(x, pattern).astype(dtype) with rearrange(x, pattern, dtype=dtype), which casts in the
+same pass that materializes the result instead of copying the data twice.
+
+Peak memory is measured with tracemalloc (NumPy reports its allocations to it): the two-pass version
+holds the intermediate full-precision copy next to the cast result.
+
+Usage:
+    python benchmarks/fused_cast.py [--mb 256] [--dtype float16] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rearrange import rearrange
+
+PATTERNS = [
+    'b h w c -> b c h w',     # view, then a cast copy
+    'b h w c -> b (c h w)',   # transposing copy
+    'b h w c -> (b h) (w c)', # view
+]
+
+def peak_bytes(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=int, default=256, help="approximate input size in MB (float32)")
+    parser.add_argument('--dtype', default='float16')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    n = int((args.mb * 1e6 / 4 / 32 / 32) ** 0.5)
+    array = np.random.rand(32, n, n, 32).astype(np.float32)
+    dtype = np.dtype(args.dtype)
+    print(f"shape={array.shape}  {array.nbytes / 1e6:.0f} MB  float32 -> {dtype}")
+    print(f"{'pattern':<26} {'astype ms':>10} {'fused ms':>9} {'speedup':>8} {'astype MB':>10} {'fused MB':>9}")
+    for pattern in PATTERNS:
+        two_pass = lambda: rearrange(array, pattern).astype(dtype)
+        fused = lambda: rearrange(array, pattern, dtype=dtype)
+        np.testing.assert_array_equal(two_pass(), fused())
+
+        times = [min(timeit.repeat(f, number=1, repeat=args.repeat)) for f in (two_pass, fused)]
+        peaks = [peak_bytes(f) / 1e6 for f in (two_pass, fused)]
+        print(f"{pattern:<26} {times[0] * 1e3:10.1f} {times[1] * 1e3:9.1f} {times[0] / times[1]:7.2f}x "
+              f"{peaks[0]:10.0f} {peaks[1]:9.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures how long `import rearrange` takes in a fresh interpreter.
+
+Each run spawns a new Python process, so nothing is cached in sys.modules. The time of
+`import numpy` alone is measured the same way and subtracted, since numpy is a hard
+dependency and its import cost is outside of this package's control.
+
+With --max-ms, the script exits with a non-zero status if the time rearrange adds on top of numpy
+exceeds the budget, so import-time regressions can fail CI.
+
+Usage:
+    python benchmarks/import_time.py [--runs 20] [--max-ms 30]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SNIPPET = """
+import sys, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+print(t1 - t0, 'torch' in sys.modules)
+"""
+
+def time_import(module, runs):
+    timings = []
+    torch_loaded = False
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(module=module)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        timings.append(float(out[0]))
+        torch_loaded = torch_loaded or out[1] == 'True'
+    return statistics.median(timings), torch_loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="fail if rearrange adds more than this many ms on top of numpy")
+    args = parser.parse_args()
+
+    numpy_time, _ = time_import('numpy', args.runs)
+    total_time, torch_loaded = time_import('numpy, rearrange', args.runs)
+
+    print(f"import numpy:                 {numpy_time * 1e3:8.2f} ms (median of {args.runs})")
+    print(f"import numpy, rearrange:      {total_time * 1e3:8.2f} ms")
+    print(f"rearrange on top of numpy:    {(total_time - numpy_time) * 1e3:8.2f} ms")
+    print(f"torch imported:               {torch_loaded}")
+
+    added_ms = (total_time - numpy_time) * 1e3
+    if torch_loaded or (args.max_ms is not None and added_ms > args.max_ms):
+        print(f"FAIL: import budget of {args.max_ms} ms exceeded or torch imported")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
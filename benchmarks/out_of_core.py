@@ -0,0 +1,69 @@
+"""
+Reports time and peak RSS of rearrange_to_file() against loading the array and rearranging in memory.
+
+Each measurement runs in a fresh process so ru_maxrss reflects that run only.
+
+Usage:
+    python benchmarks/out_of_core.py [--mb 1024] [--chunk-mb 64] [--pattern '(t c) h w -> c t h w']
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import resource, sys, time
+import numpy as np
+sys.path.insert(0, {root!r})
+from rearrange import rearrange
+from rearrange.streaming import rearrange_to_file
+
+mode, src, dst, pattern, chunk_bytes = sys.argv[1:6]
+t0 = time.perf_counter()
+if mode == 'file':
+    rearrange_to_file(src, dst, pattern, chunk_bytes=int(chunk_bytes), c={channels})
+else:
+    np.save(dst, rearrange(np.load(src), pattern, c={channels}))
+elapsed = time.perf_counter() - t0
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def run(mode, src, dst, pattern, chunk_bytes, channels):
+    code = CHILD.format(root=REPO_ROOT, channels=channels)
+    out = subprocess.run([sys.executable, '-c', code, mode, src, dst, pattern, str(chunk_bytes)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1]) / 1024  # ru_maxrss is in KiB on Linux
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=int, default=1024, help="size of the source array in MB")
+    parser.add_argument('--chunk-mb', type=int, default=64)
+    parser.add_argument('--pattern', default='(t c) h w -> c t h w')
+    parser.add_argument('--channels', type=int, default=8)
+    args = parser.parse_args()
+
+    h = w = 256
+    t = max(1, args.mb * 2**20 // (4 * args.channels * h * w))
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'src.npy')
+        # Written with plain file I/O: Linux keeps ru_maxrss across exec, so the parent must stay small
+        with open(src, 'wb') as f:
+            header = {'descr': '<f4', 'fortran_order': False, 'shape': (t * args.channels, h, w)}
+            np.lib.format.write_array_header_1_0(f, header)
+            for i in range(0, t * args.channels, 64):
+                f.write(np.random.rand(min(64, t * args.channels - i), h, w).astype(np.float32).data)
+        print(f"source: {(t * args.channels, h, w)} float32, {os.path.getsize(src) / 2**20:.0f} MB, pattern {args.pattern!r}")
+
+        for mode in ('memory', 'file'):
+            dst = os.path.join(tmp, f'dst_{mode}.npy')
+            seconds, rss = run(mode, src, dst, args.pattern, args.chunk_mb * 2**20, args.channels)
+            print(f"  {mode:<7} {seconds:7.2f} s   peak RSS {rss:8.0f} MB")
+            os.remove(dst)
+
+if __name__ == '__main__':
+    main()
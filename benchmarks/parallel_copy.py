@@ -0,0 +1,54 @@
+"""
+Measures how copying rearranges scale with the number of worker threads.
+
+Usage:
+    python benchmarks/parallel_copy.py [--max-workers N] [--mb 512] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rearrange import rearrange
+
+PATTERNS = [
+    ('b h w c -> b c h w', lambda n: (8, n, n, 8)),
+    ('h w -> w h', lambda n: (4 * n, 2 * n)),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--mb', type=int, default=512, help="approximate input size in MB (float32)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workers_list = [1]
+    while workers_list[-1] * 2 <= args.max_workers:
+        workers_list.append(workers_list[-1] * 2)
+    if workers_list[-1] != args.max_workers:
+        workers_list.append(args.max_workers)
+
+    for pattern, make_shape in PATTERNS:
+        # Solve prod(shape) * 4 bytes ~= mb for the free size n
+        n = 1
+        while np.prod(make_shape(n * 2)) * 4 <= args.mb * 1e6:
+            n *= 2
+        array = np.random.rand(*make_shape(n)).astype(np.float32)
+        out = np.empty(rearrange(array, pattern).shape, dtype=array.dtype)
+        print(f"{pattern}  shape={array.shape}  {array.nbytes / 1e6:.0f} MB")
+
+        baseline = None
+        for engine in ('numpy', 'tiled'):
+            for workers in workers_list:
+                timer = timeit.Timer(lambda: rearrange(array, pattern, out=out, engine=engine, workers=workers))
+                seconds = min(timer.repeat(repeat=args.repeat, number=1))
+                baseline = baseline or seconds
+                print(f"  engine={engine:<6} workers={workers:<3} {seconds * 1e3:8.1f} ms  "
+                      f"{array.nbytes / 1e9 / seconds:6.2f} GB/s  speedup {baseline / seconds:5.2f}x")
+
+if __name__ == '__main__':
+    main()
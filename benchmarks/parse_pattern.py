@@ -0,0 +1,68 @@
+"""
+Measures the cost of parsing patterns with the single-pass parser, compared with the previous
+regex-based pipeline (character check, singleton cleanup, tokenization of both sides, flattening
+for the identifier checks and re-tokenization of the output), reproduced below for reference.
+
+The regex pipeline ran for every Validator, i.e. on every recipe cache miss (each new input shape),
+every compile_pattern() and twice per reduce()/repeat() pattern rewrite. The parser runs once per
+pattern; every later stage reuses the cached result ('reuse' column).
+
+Usage:
+    python benchmarks/parse_pattern.py [--number 20000] [--repeat 7]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rearrange.parsing import parse_pattern
+
+PATTERNS = [
+    'a b -> b a',
+    'b c h w -> b h w c',
+    '... h w -> ... (h w)',
+    'b (h p1) (w p2) c -> b (h w) (p1 p2 c)',
+    'b (c 1 1) 1 h w -> b 1 (h w) c',
+]
+
+_VALID = re.compile(r'^([a-zA-Z]+[1-9][0-9]*|[a-zA-Z]+|\.\.\.|1)$')
+_GROUP = re.compile(r'\(([^()]+)\)')
+_TOKEN = re.compile(r'\.\.\.|\([\w\s\-]+\)|-?\w+')
+
+def regex_pipeline(pattern):
+    tokens = pattern.replace('->', '').translate(str.maketrans('', '', '()')).split()
+    if any(not _VALID.match(token) for token in tokens):
+        raise ValueError(pattern)
+
+    def clean(match):
+        content = ' '.join(dim for dim in match.group(1).split() if dim != '1')
+        return content if ' ' not in content else f'({content})'
+
+    pattern = re.sub(r'\s+', ' ', _GROUP.sub(clean, pattern)).strip()
+    input_str, output_str = pattern.split('->')
+    input_tokens = _TOKEN.findall(input_str.strip())
+    output_tokens = _TOKEN.findall(output_str.strip())
+    input_axes = " ".join(input_tokens).replace("(", "").replace(")", "").split()
+    output_axes = " ".join(output_tokens).replace("(", "").replace(")", "").split()
+    output_tokens = _TOKEN.findall(pattern.split("->")[1])
+    return input_tokens, output_tokens, input_axes, output_axes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    uncached = parse_pattern.__wrapped__
+    print(f"{'pattern':<42} {'regex us':>9} {'parser us':>10} {'reuse us':>9} {'first':>7} {'reuse':>7}")
+    for pattern in PATTERNS:
+        regex = min(timeit.repeat(lambda: regex_pipeline(pattern), number=args.number, repeat=args.repeat)) / args.number
+        single = min(timeit.repeat(lambda: uncached(pattern), number=args.number, repeat=args.repeat)) / args.number
+        cached = min(timeit.repeat(lambda: parse_pattern(pattern), number=args.number, repeat=args.repeat)) / args.number
+        print(f"{pattern:<42} {regex * 1e6:9.2f} {single * 1e6:10.2f} {cached * 1e6:9.3f} "
+              f"{regex / single:6.2f}x {regex / cached:6.0f}x")
+
+if __name__ == '__main__':
+    main()
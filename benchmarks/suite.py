@@ -0,0 +1,214 @@
+"""
+Reproducible benchmark suite comparing rearrange with einops.
+
+Covers per-call overhead on tiny arrays, large-copy throughput, ellipsis and grouping patterns, and peak
+memory. Results are written as JSON; with --baseline, they are compared against a previous run and
+regressions are reported, with a non-zero exit status. Cases slower than einops are listed for
+information only and do not affect the exit status.
+
+Usage:
+    python benchmarks/suite.py [--quick] [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+
+To record a baseline, run once with --output baseline.json and keep the file.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import rearrange as rearrange_package
+from rearrange import rearrange
+
+try:
+    import einops
+except ImportError:
+    einops = None
+
+# (name, pattern, input shape, axis sizes); the quick run scales the large cases down
+OVERHEAD = [
+    ('tiny_transpose', 'h w -> w h', (4, 4), {}),
+    ('tiny_merge', 'b h w -> b (h w)', (2, 3, 4), {}),
+    ('tiny_split', 'b (h w) -> b h w', (2, 12), {'h': 3}),
+    ('tiny_ellipsis', '... h w -> ... w h', (2, 2, 3, 3), {}),
+]
+
+THROUGHPUT = [
+    ('copy_transpose', 'h w -> w h', (4096, 4096), {}),
+    ('copy_nhwc_to_nchw', 'b h w c -> b c h w', (16, 256, 256, 16), {}),
+    ('copy_space_to_depth', 'b c (h p1) (w p2) -> b (c p1 p2) h w', (16, 16, 256, 256), {'p1': 2, 'p2': 2}),
+]
+
+PATTERNS = [
+    ('ellipsis_leading', '... c -> c ...', (8, 64, 64, 32), {}),
+    ('ellipsis_middle', 'b ... c -> b c ...', (8, 64, 64, 32), {}),
+    ('group_merge_view', 'b c h w -> b c (h w)', (8, 32, 64, 64), {}),
+    ('group_split_merge', 'b (h a) (w c) -> (b a c) h w', (8, 256, 256), {'a': 4, 'c': 4}),
+    ('singleton', 'b h w -> b 1 h w 1', (8, 256, 256), {}),
+]
+
+MEMORY = [
+    ('memory_view', 'b c h w -> b c (h w)', (16, 32, 128, 128), {}),
+    ('memory_copy', 'b h w c -> b (c h w)', (16, 128, 128, 32), {}),
+    ('memory_split_copy', 'b (h p) w c -> b c (h w p)', (16, 128, 128, 32), {'p': 2}),
+]
+
+# Memory differences below this are Python bookkeeping, not array buffers
+MEMORY_NOISE = 64 * 1024
+
+def _shrink(shape, factor):
+    """
+    Divides the largest dimension by factor, for --quick runs.
+    """
+    largest = max(range(len(shape)), key=lambda axis: shape[axis])
+    return tuple(max(1, dim // factor) if axis == largest else dim for axis, dim in enumerate(shape))
+
+def time_call(fn, repeat):
+    """
+    Best time of one call, in seconds, over `repeat` runs of a loop long enough to be measurable.
+    """
+    fn()
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def peak_memory(fn):
+    """
+    Peak bytes allocated (as traced by tracemalloc, which includes NumPy buffers) while calling fn.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_case(category, name, pattern, shape, kwargs, repeat):
+    array = np.random.rand(*shape).astype(np.float32)
+    if category == 'throughput':
+        # Both libraries return views for pure transposes; force the copy so the copy itself is measured
+        ours = lambda: rearrange(array, pattern, copy=True, **kwargs)
+        theirs = lambda: np.ascontiguousarray(einops.rearrange(array, pattern, **kwargs))
+    else:
+        ours = lambda: rearrange(array, pattern, **kwargs)
+        theirs = lambda: einops.rearrange(array, pattern, **kwargs)
+    if einops is None:
+        theirs = None
+
+    result = {'name': name, 'category': category, 'pattern': pattern, 'shape': list(shape), 'bytes': array.nbytes}
+    if category == 'memory':
+        result['rearrange'] = peak_memory(ours)
+        result['einops'] = peak_memory(theirs) if theirs else None
+        result['unit'] = 'bytes'
+    else:
+        result['rearrange'] = time_call(ours, repeat)
+        result['einops'] = time_call(theirs, repeat) if theirs else None
+        result['unit'] = 's'
+    return result
+
+def run_suite(quick=False, repeat=5):
+    factor = 8 if quick else 1
+    groups = [
+        ('overhead', OVERHEAD, 1),
+        ('throughput', THROUGHPUT, factor),
+        ('patterns', PATTERNS, factor),
+        ('memory', MEMORY, factor),
+    ]
+    results = []
+    for category, cases, shrink in groups:
+        for name, pattern, shape, kwargs in cases:
+            results.append(run_case(category, name, pattern, _shrink(shape, shrink), kwargs, repeat))
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quick': quick,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'einops': getattr(einops, '__version__', None),
+            'rearrange': rearrange_package.__version__,
+        },
+        'results': results,
+    }
+
+def _worse(new, old, unit, tolerance):
+    if new - old <= tolerance * old:
+        return False
+    return unit != 'bytes' or new - old > MEMORY_NOISE
+
+def compare(current, baseline, tolerance):
+    """
+    Returns a list of messages describing cases that regressed against the baseline by more than
+    `tolerance` (a fraction).
+    """
+    problems = []
+    previous = {case['name']: case for case in baseline['results']}
+    for case in current['results']:
+        old = previous.get(case['name'])
+        if old is not None and old['shape'] == case['shape'] and _worse(case['rearrange'], old['rearrange'], case['unit'], tolerance):
+            problems.append(f"{case['name']}: worse than baseline "
+                            f"({old['rearrange']:.4g} -> {case['rearrange']:.4g} {case['unit']})")
+    return problems
+
+def compare_einops(current, tolerance):
+    """
+    Returns a list of messages describing cases that are slower / use more memory than einops by more
+    than `tolerance` (a fraction). Informational: einops is a reference point, not a baseline.
+    """
+    notes = []
+    for case in current['results']:
+        if case['einops'] is not None and _worse(case['rearrange'], case['einops'], case['unit'], tolerance):
+            notes.append(f"{case['name']}: worse than einops "
+                         f"({case['rearrange']:.4g} vs {case['einops']:.4g} {case['unit']})")
+    return notes
+
+def _format(value, unit):
+    if value is None:
+        return '-'
+    if unit == 'bytes':
+        return f"{value / 1e6:.2f} MB"
+    return f"{value * 1e6:.2f} us" if value < 1e-3 else f"{value * 1e3:.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='use smaller arrays for the large cases')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, as a fraction')
+    args = parser.parse_args()
+
+    current = run_suite(quick=args.quick, repeat=args.repeat)
+
+    print(f"{'case':<22} {'category':<11} {'rearrange':>12} {'einops':>12} {'ratio':>7} {'GB/s':>7}")
+    for case in current['results']:
+        ratio = f"{case['rearrange'] / case['einops']:.2f}x" if case['einops'] else '-'
+        bandwidth = f"{case['bytes'] / case['rearrange'] / 1e9:.2f}" if case['category'] == 'throughput' else ''
+        print(f"{case['name']:<22} {case['category']:<11} {_format(case['rearrange'], case['unit']):>12} "
+              f"{_format(case['einops'], case['unit']):>12} {ratio:>7} {bandwidth:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    for note in compare_einops(current, args.tolerance):
+        print(f"NOTE {note}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(current, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}.")
+
+if __name__ == '__main__':
+    main()
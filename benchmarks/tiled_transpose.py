@@ -0,0 +1,50 @@
+"""
+Compares the 'numpy' and 'tiled' engines on copying rearranges across sizes and dtypes.
+
+Usage:
+    python benchmarks/tiled_transpose.py [--repeat 5] [--sizes 1024 4096 8192]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rearrange import rearrange
+
+# (pattern, input shape for size n, axis sizes for size n)
+PATTERNS = [
+    ('(h w) c -> c (h w)', lambda n: (n * n // 4, 4), lambda n: {'w': n // 2}),
+    ('h w -> w h', lambda n: (n, n), lambda n: {}),
+    ('b h w c -> b c h w', lambda n: (4, n // 4, n // 4, 16), lambda n: {}),
+]
+
+DTYPES = [np.uint8, np.float32, np.float64]
+
+def bench(array, pattern, kwargs, engine, repeat):
+    out = np.empty(rearrange(array, pattern, **kwargs).shape, dtype=array.dtype)
+    timer = timeit.Timer(lambda: rearrange(array, pattern, out=out, engine=engine, **kwargs))
+    return min(timer.repeat(repeat=repeat, number=1))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 4096, 8192])
+    args = parser.parse_args()
+
+    print(f"{'pattern':<24} {'shape':<22} {'dtype':<8} {'MB':>8} {'numpy GB/s':>11} {'tiled GB/s':>11} {'speedup':>8}")
+    for pattern, make_shape, make_kwargs in PATTERNS:
+        for n in args.sizes:
+            kwargs = make_kwargs(n)
+            for dtype in DTYPES:
+                array = np.random.rand(*make_shape(n)).astype(dtype)
+                numpy_time = bench(array, pattern, kwargs, 'numpy', args.repeat)
+                tiled_time = bench(array, pattern, kwargs, 'tiled', args.repeat)
+                gb = array.nbytes / 1e9
+                print(f"{pattern:<24} {str(array.shape):<22} {np.dtype(dtype).name:<8} {array.nbytes / 1e6:8.1f} "
+                      f"{gb / numpy_time:11.2f} {gb / tiled_time:11.2f} {numpy_time / tiled_time:7.2f}x")
+
+if __name__ == '__main__':
+    main()
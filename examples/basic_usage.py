@@ -1,7 +1,7 @@
 #examples.py
 
 import numpy as np
-from rearrange import rearrange
+from rearrange import rearrange, repeat
 
 # Transpose
 x = np.random.rand(3, 4)
@@ -24,13 +24,20 @@ result = rearrange(x, pattern)
 print(f"Input Shape: {x.shape} \nPattern: {pattern} \nOutput Shape: {result.shape}")
 print("="*50)
 
-# Repeat an axis
+# Add a singleton axis
 x = np.random.rand(3, 1, 5)
 pattern = 'a b c -> a b 1 c'
 result = rearrange(x, pattern)
 print(f"Input Shape: {x.shape} \nPattern: {pattern} \nOutput Shape: {result.shape}")
 print("="*50)
 
+# Repeat an axis
+x = np.random.rand(3, 5)
+pattern = 'h w -> h w c'
+result = repeat(x, pattern, c=3)
+print(f"Input Shape: {x.shape} \nPattern: {pattern} \nOutput Shape: {result.shape}")
+print("="*50)
+
 # Handle batch dimensions
 x = np.random.rand(2, 3, 4, 5)
 pattern = '... h w -> ... (h w)'
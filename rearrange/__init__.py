@@ -1,4 +1,14 @@
-from .rearrange import rearrange
+from .rearrange import rearrange, rearrange_many, will_copy, reduce, repeat
+from .compiled import Rearrangement, compile_pattern
+from .backends import Backend, register_backend, unregister_backend
+from .engines import set_num_workers, get_num_workers
+from .asynchronous import arearrange, set_executor, get_executor
+from .streaming import rearrange_to_file, rearrange_stream
+from .packing import pack, unpack
+from .profiling import profile, stats
+from .parsing import PatternError
+from .cache import cache_info, clear_cache, set_cache_size
+from .plans import save_plans, load_plans
 
 __version__ = '0.1.0'
-__all__ = ['rearrange'] 
\ No newline at end of file
+__all__ = ['rearrange', 'rearrange_many', 'reduce', 'repeat', 'will_copy', 'arearrange', 'set_executor', 'get_executor', 'rearrange_to_file', 'rearrange_stream', 'pack', 'unpack', 'compile_pattern', 'Rearrangement', 'Backend', 'register_backend', 'unregister_backend', 'set_num_workers', 'get_num_workers', 'profile', 'stats', 'PatternError', 'cache_info', 'clear_cache', 'set_cache_size', 'save_plans', 'load_plans']
\ No newline at end of file
@@ -0,0 +1,77 @@
+import contextvars
+from concurrent.futures import Executor
+from math import prod
+import numpy as np
+from .rearrange import _get_recipe, _execute, _as_view, _check_order, _to_array
+from . import profiling
+
+# Copies producing fewer bytes than this run on the event loop; handing them to a thread would cost
+# more than the copy itself
+OFFLOAD_THRESHOLD = 1024 * 1024
+
+_executor = None
+
+def set_executor(executor):
+    """
+    Sets the executor running the copies of arearrange(). None (the default) uses the event loop's
+    default executor.
+
+    Args:
+        executor (concurrent.futures.Executor or None): executor to submit copies to.
+    """
+    global _executor
+    if executor is not None and not isinstance(executor, Executor):
+        raise TypeError(f"Expected a concurrent.futures.Executor or None, got {type(executor)}.")
+    _executor = executor
+
+def get_executor():
+    return _executor
+
+async def arearrange(array, pattern, out=None, order='keep', copy=None, engine='numpy', workers=None, dtype=None, executor=None, **kwargs):
+    """
+    Coroutine version of rearrange() that keeps the event loop responsive.
+
+    The plan lookup runs on the event loop. Results that are views of the input are returned
+    immediately, without leaving the loop; copies of at least OFFLOAD_THRESHOLD bytes are
+    materialized in an executor while the loop keeps serving other tasks (NumPy releases the GIL
+    while copying). Non-NumPy arrays are always rearranged in the executor, as whether their
+    backend copies is not known in advance.
+
+    Args:
+        array: array to rearrange, as accepted by rearrange().
+        pattern (str): einops-like pattern.
+        out, order, copy, engine, workers, dtype: as in rearrange().
+        executor (concurrent.futures.Executor, optional): executor running the copy. Defaults to
+            set_executor(), or the event loop's default executor.
+        kwargs: axis sizes, as accepted by rearrange(). `executor` is reserved and cannot be used as
+            an axis name, in addition to the names reserved by rearrange().
+
+    Returns:
+        The rearranged array, as rearrange() would return it.
+    """
+    _check_order(order)
+    backend, array = _to_array(array, dtype)
+    shape = backend.shape(array)
+    recipe = _get_recipe(shape, pattern, kwargs)
+
+    def run():
+        if profiling._open_blocks and profiling._active.get() is not None:
+            return profiling.profiled_call(
+                pattern, array, shape, lambda shape: recipe,
+                lambda recipe: _execute(array, recipe, backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype))
+        return _execute(array, recipe, backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype)
+
+    if isinstance(array, np.ndarray):
+        cast = dtype is not None and np.dtype(dtype) != array.dtype
+        if out is None and copy is not True and not cast and _as_view(array, recipe, order) is not None:
+            return run()
+        # copy=False without a view only raises, and small copies are cheaper than a thread hand-off
+        itemsize = np.dtype(dtype).itemsize if cast else array.itemsize
+        if copy is False or prod(recipe.final_shape) * itemsize < OFFLOAD_THRESHOLD:
+            return run()
+
+    # Imported here: asyncio takes longer to import than the rest of the package, and most callers never need it
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # Run in a copy of this context, so a profile() block open in the calling task records the copy
+    return await loop.run_in_executor(executor or _executor, contextvars.copy_context().run, run)
@@ -0,0 +1,185 @@
+import numpy as np
+from .utils import to_numpy_array, _is_torch_tensor
+
+class Backend:
+    """
+    Interface used to execute recipes on a family of arrays.
+
+    Subclasses implement is_appropriate() to claim arrays and the four array operations below.
+    Recipes are computed from shapes alone, so a backend never has to understand patterns.
+    Register custom backends with register_backend().
+    """
+
+    name = None
+
+    def is_appropriate(self, x):
+        """
+        Returns True if this backend should handle x.
+        """
+        raise NotImplementedError
+
+    def to_array(self, x):
+        """
+        Converts x to the array type native to this backend (identity for most backends).
+        """
+        return x
+
+    def shape(self, x):
+        return tuple(x.shape)
+
+    def can_merge_axes(self, x):
+        """
+        Returns True if reshaping x to merge adjacent axes is free, which lets recipes transpose
+        fewer, larger axes. The safe default keeps the full recipe.
+        """
+        return False
+
+    def reshape(self, x, shape):
+        raise NotImplementedError
+
+    def transpose(self, x, axes):
+        raise NotImplementedError
+
+    def broadcast_to(self, x, shape):
+        """
+        Returns x broadcast to shape, ideally as a view without copying.
+        """
+        raise NotImplementedError(f"Backend {self.name!r} does not support broadcasting.")
+
+    def reduce(self, x, operation, axes):
+        """
+        Reduces x over axes with operation, one of 'sum', 'mean', 'max', 'min' or 'prod'.
+        """
+        raise NotImplementedError(f"Backend {self.name!r} does not support reductions.")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name!r}>"
+
+class NumpyBackend(Backend):
+    """
+    Executes recipes with NumPy. Lists, buffers and other array-like inputs no backend claims are
+    converted with to_numpy_array, without copying when they already hold their elements in memory.
+    """
+
+    name = 'numpy'
+
+    def is_appropriate(self, x):
+        return isinstance(x, (np.ndarray, list))
+
+    def to_array(self, x):
+        return to_numpy_array(x)
+
+    def shape(self, x):
+        return x.shape
+
+    def can_merge_axes(self, x):
+        return x.flags.c_contiguous
+
+    def reshape(self, x, shape):
+        return x.reshape(shape)
+
+    def transpose(self, x, axes):
+        return x.transpose(axes)
+
+    def broadcast_to(self, x, shape):
+        return np.broadcast_to(x, shape)
+
+    def reduce(self, x, operation, axes):
+        return getattr(np, operation)(x, axis=axes)
+
+class TorchBackend(Backend):
+    """
+    Executes recipes with Tensor.reshape/Tensor.permute, so the result stays a tensor on the same
+    device, is a view whenever torch can make one and participates in autograd.
+    """
+
+    name = 'torch'
+
+    def is_appropriate(self, x):
+        return _is_torch_tensor(x)
+
+    def can_merge_axes(self, x):
+        return x.is_contiguous()
+
+    def reshape(self, x, shape):
+        return x.reshape(shape)
+
+    def transpose(self, x, axes):
+        return x.permute(axes)
+
+    def broadcast_to(self, x, shape):
+        return x.expand(shape)
+
+    def reduce(self, x, operation, axes):
+        if operation == 'prod':
+            # Tensor.prod only reduces one dimension at a time
+            for axis in sorted(axes, reverse=True):
+                x = x.prod(dim=axis)
+            return x
+        return getattr(x, {'max': 'amax', 'min': 'amin'}.get(operation, operation))(dim=axes)
+
+class ArrayApiBackend(Backend):
+    """
+    Executes recipes through the array's own namespace (Array API standard), so lazy or
+    device-resident arrays such as JAX arrays stay in their library and are never materialized
+    as NumPy copies.
+    """
+
+    name = 'array_api'
+
+    def is_appropriate(self, x):
+        return hasattr(x, '__array_namespace__')
+
+    def can_merge_axes(self, x):
+        # The standard has no views, so reshapes are always value-based
+        return True
+
+    def reshape(self, x, shape):
+        return x.__array_namespace__().reshape(x, shape)
+
+    def transpose(self, x, axes):
+        return x.__array_namespace__().permute_dims(x, axes)
+
+    def broadcast_to(self, x, shape):
+        return x.__array_namespace__().broadcast_to(x, shape)
+
+    def reduce(self, x, operation, axes):
+        return getattr(x.__array_namespace__(), operation)(x, axis=axes)
+
+_numpy_backend = NumpyBackend()
+_torch_backend = TorchBackend()
+
+# Checked in order; register_backend() puts user backends in front of the built-in ones
+_backends = [_numpy_backend, _torch_backend, ArrayApiBackend()]
+
+def register_backend(backend):
+    """
+    Registers a backend so that arrays it claims are rearranged natively.
+
+    Args:
+        backend (Backend): instance implementing is_appropriate, reshape and transpose.
+
+    Raises:
+        TypeError: If backend is not a Backend instance.
+    """
+    if not isinstance(backend, Backend):
+        raise TypeError(f"Expected a Backend instance, got {type(backend)}.")
+    if backend not in _backends:
+        _backends.insert(0, backend)
+
+def unregister_backend(backend):
+    """
+    Removes a backend previously added with register_backend.
+    """
+    _backends.remove(backend)
+
+def get_backend(array):
+    """
+    Returns the backend that should execute a recipe on array.
+
+    NumPy is the fallback: unsupported inputs are rejected by to_numpy_array with a TypeError.
+    """
+    for backend in _backends:
+        if backend.is_appropriate(array):
+            return backend
+    return _numpy_backend
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+class RecipeCache:
+    """
+    Bounded, thread-safe LRU cache of compiled rearrange plans.
+
+    Keys are built by the caller (pattern, number of input dimensions and keyword arguments) and
+    values are the Plans returned by build_plan. A maxsize of None makes the cache unbounded and a
+    maxsize of 0 disables caching altogether.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._check_maxsize(maxsize)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check_maxsize(maxsize):
+        if maxsize is not None and (not isinstance(maxsize, int) or maxsize < 0):
+            raise ValueError(f"Cache size must be a non-negative integer or None, got {maxsize!r}.")
+
+    def get(self, key):
+        """
+        Returns the cached plan for key (marking it as most recently used), or None on a miss.
+        """
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def put(self, key, plan):
+        """
+        Stores a plan, evicting the least recently used entries if the cache is full.
+        """
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = plan
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        if self.maxsize is None:
+            return
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def resize(self, maxsize):
+        """
+        Changes the maximum number of entries, evicting the oldest ones if needed.
+        """
+        self._check_maxsize(maxsize)
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """
+        Removes all entries and resets the hit/miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def items(self):
+        """
+        Returns a snapshot of the (key, plan) entries, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries.items())
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+_recipe_cache = RecipeCache()
+
+def cache_info():
+    """
+    Returns hits, misses, maxsize and current size of the global recipe cache.
+    """
+    return _recipe_cache.info()
+
+def clear_cache():
+    """
+    Empties the global recipe cache and resets its counters.
+    """
+    _recipe_cache.clear()
+
+def set_cache_size(maxsize):
+    """
+    Sets the maximum number of plans kept by the global cache (None for unbounded, 0 to disable).
+    """
+    _recipe_cache.resize(maxsize)
@@ -0,0 +1,133 @@
+from .parsing import parse_pattern, GROUP
+from .cache import RecipeCache
+from .plans import build_plan
+from .rearrange import _execute, _check_order, _to_array
+from . import profiling
+
+class Rearrangement:
+    """
+    A pattern compiled once and applied many times.
+
+    Everything that only depends on the pattern (parsing, identifier and argument checks) runs in
+    the constructor, so errors surface at construction time. Patterns without an ellipsis are
+    compiled into their Plan right away; with an ellipsis, one plan per number of input dimensions
+    is compiled on first use and memoized on the object. Calls only compute the concrete shapes
+    from the plan, whatever the batch size.
+
+    Example:
+        patchify = compile_pattern('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', p1=16, p2=16)
+        patches = patchify(images)
+    """
+
+    # Number of distinct input ranks whose plans are kept per object
+    max_plans = 64
+
+    def __init__(self, pattern, **kwargs):
+        self.pattern = pattern
+        self.kwargs = kwargs
+        self._plans = RecipeCache(maxsize=self.max_plans)
+        self._last_shape = None
+
+        # Compiling for the smallest valid rank runs every pattern check; without an ellipsis it is
+        # also the only rank the pattern accepts
+        input_side = parse_pattern(pattern).input
+        ndim = len(input_side.terms) - input_side.has_ellipsis
+        self._plans.put(ndim, build_plan(pattern, ndim, **kwargs))
+
+    def plan(self, ndim):
+        """
+        Returns the Plan of the pattern for inputs with ndim dimensions.
+        """
+        plan = self._plans.get(ndim)
+        if profiling._open_blocks and profiling._active.get() is not None:
+            profiling.count_lookup(self.pattern, plan is not None)
+        if plan is None:
+            plan = build_plan(self.pattern, ndim, **self.kwargs)
+            self._plans.put(ndim, plan)
+        return plan
+
+    def recipe(self, shape):
+        """
+        Returns the (init_shape, axes, final_shape) recipe for an input shape.
+        """
+        shape = self._last_shape = tuple(shape)
+        plan = self.plan(len(shape))
+        if profiling._open_blocks and profiling._active.get() is not None:
+            clock = profiling.stage_clock(self.pattern)
+            recipe = plan.recipe(shape)
+            clock.lap('shapes')
+            return recipe
+        return plan.recipe(shape)
+
+    def __call__(self, array, out=None, order='keep', copy=None, engine='numpy', workers=None, dtype=None):
+        """
+        Applies the pattern to array. out, order, copy, engine, workers and dtype behave as in rearrange().
+        """
+        _check_order(order)
+        backend, array = _to_array(array, dtype)
+        if profiling._open_blocks and profiling._active.get() is not None:
+            return profiling.profiled_call(
+                self.pattern, array, backend.shape(array), self.recipe,
+                lambda recipe: _execute(array, recipe, backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype))
+        return _execute(array, self.recipe(backend.shape(array)), backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype)
+
+    def inverse(self, shape=None):
+        """
+        Returns the Rearrangement undoing this one, e.g. 'b (h w) (p1 p2 c) -> b (h p1) (w p2) c' for
+        'b (h p1) (w p2) c -> b (h w) (p1 p2 c)'.
+
+        The sizes of the axes merged by this pattern (h, w, p1, p2 and c above) are bound from the
+        forward input shape, and the reverse plan is derived from the forward one, so the inverse
+        needs no parsing, validation or size inference.
+
+        Args:
+            shape (tuple, optional): forward input shape. Defaults to the shape of the last call.
+
+        Raises:
+            ValueError: If no shape is given and the Rearrangement has not been called yet.
+        """
+        if shape is None:
+            if self._last_shape is None:
+                raise ValueError(f"{self!r} has not been called yet; pass the forward input shape to inverse().")
+            shape = self._last_shape
+        shape = tuple(shape)
+        plan = self.plan(len(shape))
+        reverse = plan.inverse(shape)
+
+        merged = {axis for term in parse_pattern(self.pattern).output.terms if term.kind == GROUP for axis in term.axes}
+        kwargs = {axis: size for axis, size in plan.axis_sizes(shape).items() if axis in merged}
+        inverse = Rearrangement.__new__(Rearrangement)
+        inverse.__setstate__({'pattern': reverse.pattern, 'kwargs': kwargs, 'plans': [reverse]})
+        return inverse
+
+    def __getstate__(self):
+        # Ship the compiled plans rather than the cache and its lock, so unpickling skips compilation
+        return {'pattern': self.pattern, 'kwargs': self.kwargs, 'plans': [plan for _, plan in self._plans.items()]}
+
+    def __setstate__(self, state):
+        self.pattern = state['pattern']
+        self.kwargs = state['kwargs']
+        self._plans = RecipeCache(maxsize=self.max_plans)
+        self._last_shape = None
+        for plan in state['plans']:
+            self._plans.put(plan.ndim, plan)
+
+    def __repr__(self):
+        args = "".join(f", {k}={v!r}" for k, v in self.kwargs.items())
+        return f"Rearrangement({self.pattern!r}{args})"
+
+def compile_pattern(pattern, **kwargs):
+    """
+    Compiles a rearrange pattern into a reusable Rearrangement.
+
+    Args:
+        pattern (str): einops-like pattern, e.g. 'b (h p1) (w p2) c -> b (h w) (p1 p2 c)'.
+        kwargs: axis sizes, as accepted by rearrange().
+
+    Returns:
+        Rearrangement: callable applying the pattern to arrays.
+
+    Raises:
+        ValueError: If the pattern or the provided arguments are invalid.
+    """
+    return Rearrangement(pattern, **kwargs)
@@ -0,0 +1,173 @@
+import os
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Bytes of one source tile plus one destination tile; small enough to stay in L1/L2 together
+TILE_BYTES = 32 * 1024
+
+def _tile_size(itemsize):
+    """
+    Side of a square tile holding about TILE_BYTES of data, rounded down to a power of two.
+    """
+    side = 8
+    while (2 * side) ** 2 * itemsize <= TILE_BYTES:
+        side *= 2
+    return side
+
+def tiled_copyto(dst, src, tile=None, casting='same_kind'):
+    """
+    Copies src into dst (same shape) in cache-sized tiles.
+
+    When the axis that is contiguous in src differs from the one contiguous in dst, a plain strided
+    copy reads one of them with a large stride and thrashes the cache. This copies square tiles over
+    those two axes instead, so each tile is read and written while it is still cached. The remaining
+    axes are iterated by NumPy inside each tile copy. If either axis is shorter than a tile, or dst
+    overlaps src (tiles would read data already overwritten), a plain np.copyto is used.
+
+    Parameters:
+    - dst: np.ndarray, destination.
+    - src: np.ndarray, source with the same shape as dst.
+    - tile: int, optional side of the tiles (in elements). Derived from the itemsize if omitted.
+    - casting: str, as in np.copyto, when dst and src have different dtypes.
+    """
+    if dst.ndim < 2 or dst.size == 0 or np.may_share_memory(dst, src):
+        np.copyto(dst, src, casting=casting)
+        return
+
+    candidates = [axis for axis in range(dst.ndim) if dst.shape[axis] > 1]
+    dst_axis = min(candidates, key=lambda axis: abs(dst.strides[axis]), default=None)
+    src_axis = min(candidates, key=lambda axis: abs(src.strides[axis]), default=None)
+    if dst_axis == src_axis:
+        np.copyto(dst, src, casting=casting)
+        return
+
+    if tile is None:
+        tile = _tile_size(max(dst.itemsize, src.itemsize))
+
+    # A short axis already fits in cache lines; tiling would only add Python overhead
+    if dst.shape[src_axis] < tile or dst.shape[dst_axis] < tile:
+        np.copyto(dst, src, casting=casting)
+        return
+
+    index = [slice(None)] * dst.ndim
+    for a in range(0, dst.shape[src_axis], tile):
+        index[src_axis] = slice(a, a + tile)
+        for b in range(0, dst.shape[dst_axis], tile):
+            index[dst_axis] = slice(b, b + tile)
+            block = tuple(index)
+            np.copyto(dst[block], src[block], casting=casting)
+
+# Copies smaller than this stay on the calling thread; thread hand-off would cost more than it saves
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+_num_workers = 1
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+def set_num_workers(workers):
+    """
+    Sets the default number of threads used to materialize copying rearranges (1 disables threading).
+
+    Args:
+        workers (int): number of threads, or -1 for os.cpu_count().
+    """
+    global _num_workers
+    _num_workers = _resolve_workers(workers)
+
+def get_num_workers():
+    return _num_workers
+
+def _resolve_workers(workers):
+    if workers is None:
+        return _num_workers
+    if workers == -1:
+        return os.cpu_count() or 1
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError(f"workers must be a positive integer or -1, got {workers!r}.")
+    return workers
+
+def _get_pool(workers):
+    """
+    Returns a shared thread pool with at least `workers` threads.
+
+    The pool is sized for all cores up front. A larger request replaces it without shutting the old
+    one down, since other threads may still be submitting to it; its idle threads exit once the last
+    caller drops it.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size < workers:
+            _pool_size = max(workers, os.cpu_count() or 1)
+            _pool = ThreadPoolExecutor(max_workers=_pool_size, thread_name_prefix='rearrange')
+        return _pool
+
+def parallel_copyto(dst, src, workers, copyto=np.copyto):
+    """
+    Copies src into dst by splitting them along one leading axis and copying the slices concurrently.
+
+    NumPy releases the GIL while copying, so the slices are filled in parallel. Copies smaller than
+    PARALLEL_THRESHOLD bytes, and copies whose dst overlaps src (a slice could overwrite data another
+    slice still has to read), are done on the calling thread in one call.
+
+    Parameters:
+    - dst: np.ndarray, destination.
+    - src: np.ndarray, source with the same shape as dst.
+    - workers: int, number of threads.
+    - copyto: function used to copy each slice (np.copyto or tiled_copyto).
+    """
+    if workers <= 1 or dst.nbytes < PARALLEL_THRESHOLD or dst.ndim == 0 or np.may_share_memory(dst, src):
+        copyto(dst, src)
+        return
+
+    # Prefer the outermost axis that gives every worker a slice; fall back to the longest one
+    axis = next((a for a in range(dst.ndim) if dst.shape[a] >= workers), None)
+    if axis is None:
+        axis = max(range(dst.ndim), key=lambda a: dst.shape[a])
+
+    extent = dst.shape[axis]
+    chunks = min(workers, extent)
+    bounds = [extent * i // chunks for i in range(chunks + 1)]
+    index = [slice(None)] * dst.ndim
+
+    def copy_chunk(start, stop):
+        block = list(index)
+        block[axis] = slice(start, stop)
+        block = tuple(block)
+        copyto(dst[block], src[block])
+
+    pool = _get_pool(chunks)
+    futures = [pool.submit(copy_chunk, bounds[i], bounds[i + 1]) for i in range(chunks)]
+    for future in futures:
+        future.result()
+
+ENGINES = {
+    'numpy': np.copyto,
+    'tiled': tiled_copyto,
+}
+
+def get_copy_function(engine, workers=None, casting='same_kind'):
+    """
+    Returns the copy function used to materialize copying rearranges with the given engine.
+
+    Args:
+        engine (str): 'numpy' or 'tiled'.
+        workers (int, optional): number of threads, or -1 for all cores. Defaults to set_num_workers().
+        casting (str): casting rule of the copy, as in np.copyto; 'unsafe' casts like astype().
+
+    Raises:
+        ValueError: If the engine is unknown or workers is invalid.
+    """
+    try:
+        copyto = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"Unknown engine {engine!r}. Expected one of {list(ENGINES)}.") from None
+    if casting != 'same_kind':
+        copyto = partial(copyto, casting=casting)
+
+    workers = _resolve_workers(workers)
+    if workers == 1:
+        return copyto
+    return lambda dst, src: parallel_copyto(dst, src, workers, copyto)
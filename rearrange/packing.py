@@ -0,0 +1,108 @@
+from math import prod
+import numpy as np
+from .utils import to_numpy_array
+from .parsing import parse_pack_pattern, STAR
+
+def _parse_pack_pattern(pattern):
+    """
+    Parses a pack pattern such as 'b * c' into the number of axes before and after '*'.
+
+    Raises:
+        PatternError: If the pattern does not contain exactly one '*', or contains anything but plain,
+            distinct axis names besides it.
+    """
+    side = parse_pack_pattern(pattern)
+    n_before = next(i for i, term in enumerate(side.terms) if term.kind == STAR)
+    return n_before, len(side.terms) - n_before - 1
+
+def _star_shape(shape, n_before, n_after, pattern):
+    if len(shape) < n_before + n_after:
+        raise ValueError(f"Array of shape {shape} has fewer dimensions than pattern {pattern!r} requires.")
+    return shape[n_before:len(shape) - n_after]
+
+def pack(arrays, pattern, out=None):
+    """
+    Packs arrays that share the axes named in pattern into one array, merging the '*' axes.
+
+    Each array is copied exactly once, straight into its slice of a single preallocated output
+    (the slice is viewed with the array's own shape, which never copies).
+
+    Example:
+        packed, ps = pack([image_tokens, text_tokens], 'b * c')
+        # image_tokens (b, h, w, c) and text_tokens (b, t, c) -> packed (b, h*w + t, c)
+
+    Args:
+        arrays (sequence): arrays to pack.
+        pattern (str): axis names with exactly one '*', e.g. 'b * c'.
+        out (np.ndarray, optional): preallocated output buffer.
+
+    Returns:
+        tuple: (packed array, list of the '*' shapes of each input, to be passed to unpack)
+
+    Raises:
+        ValueError: If the pattern is invalid or the arrays disagree on the named axes.
+    """
+    n_before, n_after = _parse_pack_pattern(pattern)
+    arrays = [to_numpy_array(array) for array in arrays]
+    if not arrays:
+        raise ValueError("Cannot pack an empty sequence of arrays.")
+
+    packed_shapes = [_star_shape(array.shape, n_before, n_after, pattern) for array in arrays]
+    before = arrays[0].shape[:n_before]
+    after = arrays[0].shape[arrays[0].ndim - n_after:]
+    for array in arrays[1:]:
+        if array.shape[:n_before] != before or array.shape[array.ndim - n_after:] != after:
+            raise ValueError(f"Arrays of shapes {arrays[0].shape} and {array.shape} cannot be packed with {pattern!r}.")
+
+    total = sum(prod(shape) for shape in packed_shapes)
+    packed_shape = before + (total,) + after
+    if out is None:
+        out = np.empty(packed_shape, dtype=np.result_type(*arrays))
+    elif out.shape != packed_shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {packed_shape}.")
+
+    offset = 0
+    for array, star in zip(arrays, packed_shapes):
+        size = prod(star)
+        index = (slice(None),) * n_before + (slice(offset, offset + size),)
+        np.copyto(out[index].reshape(array.shape), array)
+        offset += size
+
+    return out, [tuple(shape) for shape in packed_shapes]
+
+def unpack(packed, packed_shapes, pattern):
+    """
+    Splits an array produced by pack back into arrays with their original '*' shapes.
+
+    The results are views of packed; nothing is copied.
+
+    Args:
+        packed (np.ndarray): packed array.
+        packed_shapes (list): '*' shapes as returned by pack.
+        pattern (str): the pattern used to pack, e.g. 'b * c'.
+
+    Returns:
+        list: views of packed with the original shapes.
+
+    Raises:
+        ValueError: If the shapes do not add up to the packed axis.
+    """
+    n_before, n_after = _parse_pack_pattern(pattern)
+    packed = to_numpy_array(packed)
+    if packed.ndim != n_before + n_after + 1:
+        raise ValueError(f"Packed array of shape {packed.shape} does not match pattern {pattern!r}.")
+
+    sizes = [prod(shape) for shape in packed_shapes]
+    if sum(sizes) != packed.shape[n_before]:
+        raise ValueError(f"Packed shapes {packed_shapes} add up to {sum(sizes)} elements, "
+                         f"but the packed axis has {packed.shape[n_before]}.")
+
+    before = packed.shape[:n_before]
+    after = packed.shape[n_before + 1:]
+    results = []
+    offset = 0
+    for shape, size in zip(packed_shapes, sizes):
+        index = (slice(None),) * n_before + (slice(offset, offset + size),)
+        results.append(packed[index].reshape(before + tuple(shape) + after))
+        offset += size
+    return results
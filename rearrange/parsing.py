@@ -0,0 +1,252 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+class PatternError(ValueError):
+    """
+    Raised for malformed patterns. `pattern` and `position` locate the offending character, which
+    the message points at with a caret.
+    """
+
+    def __init__(self, message, pattern, position):
+        self.message = message
+        self.pattern = pattern
+        self.position = position
+        super().__init__(f"{message}\n    {pattern}\n    {' ' * position}^")
+
+    def __reduce__(self):
+        return type(self), (self.message, self.pattern, self.position)
+
+AXIS = 'axis'
+GROUP = 'group'
+ELLIPSIS = 'ellipsis'
+SINGLETON = 'singleton'
+STAR = 'star'
+
+class Term(namedtuple('Term', ['kind', 'axes', 'position'])):
+    """
+    One top-level entry of a pattern side.
+
+    kind is AXIS ('h'), GROUP ('(h w)'), ELLIPSIS ('...'), SINGLETON ('1') or STAR ('*', pack
+    patterns only). axes holds the axis names of AXIS and GROUP terms and is empty otherwise;
+    position is the index of the term's first character in the pattern.
+    """
+
+    __slots__ = ()
+
+    @property
+    def token(self):
+        """
+        The canonical text of the term: 'h', '(h w)', '...', '1' or '*'.
+        """
+        if self.kind == AXIS:
+            return self.axes[0]
+        if self.kind == GROUP:
+            return f"({' '.join(self.axes)})"
+        return {ELLIPSIS: '...', SINGLETON: '1', STAR: '*'}[self.kind]
+
+class Side(namedtuple('Side', ['terms', 'axes', 'tokens', 'has_ellipsis'])):
+    """
+    One side of a pattern: its terms, the axis names in order (groups flattened, without ellipsis
+    and singletons), the canonical tokens and whether it contains an ellipsis.
+    """
+
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return ' '.join(self.tokens)
+
+    def position_of(self, axis):
+        """
+        Returns the position of the term containing axis.
+        """
+        return next(term.position for term in self.terms if axis in term.axes)
+
+ParsedPattern = namedtuple('ParsedPattern', ['pattern', 'input', 'output'])
+
+# One alternation scanned left to right: every character of a pattern is consumed by exactly one match,
+# and a whole group '(...)' is a single match
+_LEXER = re.compile(r"""
+    \s*(?:
+    (?P<name>[a-zA-Z]+(?:[1-9][0-9]*)?(?!\w))
+  | (?P<group>\([^()]*\))
+  | (?P<number>[0-9]+(?!\w))
+  | (?P<ellipsis>\.\.\.)
+  | (?P<arrow>->)
+  | (?P<star>\*)
+  | (?P<other>\S)
+  | \Z)
+""", re.VERBOSE)
+
+_AXIS = r'(?:[a-zA-Z]+(?:[1-9][0-9]*)?|1)(?!\w)'
+_GROUP_BODY = re.compile(rf'\s*(?:{_AXIS}\s*)*\Z')
+_ANONYMOUS_GROUP_BODY = re.compile(rf'\s*(?:(?:{_AXIS}|[1-9][0-9]*(?!\w))\s*)*\Z')
+_WORD = re.compile(r'[^\s()]+')
+
+# namedtuple constructors go through a Python-level __new__; tuple.__new__ builds the same object directly
+_new_tuple = tuple.__new__
+
+def _make_side(terms, tokens, pattern):
+    axes = []
+    for term in terms:
+        axes.extend(term[1])
+    if len(set(axes)) != len(axes):
+        seen = set()
+        for term in terms:
+            for axis in term.axes:
+                # Anonymous axes (integers) may repeat: each is a distinct axis
+                if axis in seen and not axis.isdigit():
+                    raise PatternError(f"Axis '{axis}' appears more than once on one side", pattern, term.position)
+                seen.add(axis)
+    return _new_tuple(Side, (tuple(terms), tuple(axes), tuple(tokens), '...' in tokens))
+
+def _invalid_word(pattern, start, end, anonymous):
+    """
+    Raises a PatternError at the first word between start and end that is not a valid axis.
+    """
+    for match in _WORD.finditer(pattern, start, end):
+        word = match.group()
+        if word == '...':
+            raise PatternError("Ellipsis inside parentheses is not supported", pattern, match.start())
+        if not re.fullmatch(_AXIS, word) and not (anonymous and re.fullmatch(r'[1-9][0-9]*', word)):
+            raise PatternError(f"Invalid axis name '{word}'", pattern, match.start())
+    raise PatternError("Invalid group", pattern, start)
+
+def _scan(pattern, anonymous=False, star=False):
+    """
+    Splits a pattern into sides (separated by '->') of terms, in one pass over its characters.
+
+    Singletons inside parentheses are dropped and a group left with a single axis becomes that axis,
+    so '(c 1)' reads as 'c'. With anonymous=True, integers other than 1 are accepted as axis names
+    (for reduce and repeat to rename); with star=True, '*' is accepted as a term (for pack).
+
+    Raises:
+        PatternError: On the first malformed character, with its position.
+    """
+    group_body = _ANONYMOUS_GROUP_BODY if anonymous else _GROUP_BODY
+    sides = []
+    terms = []
+    tokens = []
+    for match in _LEXER.finditer(pattern):
+        kind = match.lastgroup
+        if kind == 'name':
+            word = match.group(kind)
+            terms.append(_new_tuple(Term, (AXIS, (word,), match.start(kind))))
+            tokens.append(word)
+        elif kind == 'group':
+            start, end = match.span(kind)
+            if not group_body.match(pattern, start + 1, end - 1):
+                _invalid_word(pattern, start + 1, end - 1, anonymous)
+            axes = [axis for axis in pattern[start + 1:end - 1].split() if axis != '1']
+            if len(axes) > 1:
+                terms.append(_new_tuple(Term, (GROUP, tuple(axes), start)))
+                tokens.append(f"({' '.join(axes)})")
+            elif axes:
+                terms.append(_new_tuple(Term, (AXIS, (axes[0],), pattern.index(axes[0], start))))
+                tokens.append(axes[0])
+        elif kind == 'arrow':
+            sides.append(_make_side(terms, tokens, pattern))
+            terms = []
+            tokens = []
+        elif kind is None:
+            continue
+        else:
+            _append_other(terms, tokens, kind, match, pattern, anonymous, star)
+
+    sides.append(_make_side(terms, tokens, pattern))
+    return sides
+
+def _append_other(terms, tokens, kind, match, pattern, anonymous, star):
+    """
+    Handles the less common terms of _scan: numbers, ellipses, '*' and errors.
+    """
+    start = match.start(kind)
+    if kind == 'number':
+        word = match.group(kind)
+        if word == '1':
+            terms.append(_new_tuple(Term, (SINGLETON, (), start)))
+        elif anonymous and word[0] != '0':
+            terms.append(_new_tuple(Term, (AXIS, (word,), start)))
+        else:
+            raise PatternError(f"Invalid axis name '{word}'", pattern, start)
+        tokens.append(word)
+    elif kind == 'ellipsis':
+        if '...' in tokens:
+            raise PatternError("More than one ellipsis on one side", pattern, start)
+        terms.append(_new_tuple(Term, (ELLIPSIS, (), start)))
+        tokens.append('...')
+    elif kind == 'star' and star:
+        terms.append(_new_tuple(Term, (STAR, (), start)))
+        tokens.append('*')
+    else:
+        _unexpected(pattern, start)
+
+def _unexpected(pattern, position):
+    c = pattern[position]
+    if c == '(':
+        closing = pattern.find(')', position + 1)
+        nested = pattern.find('(', position + 1)
+        if closing == -1:
+            raise PatternError("Unclosed '('", pattern, position)
+        raise PatternError("Nested parentheses are not supported", pattern, nested)
+    if c == ')':
+        raise PatternError("Unmatched ')'", pattern, position)
+    if c.isalnum() or c == '_':
+        word = _WORD.match(pattern, position).group()
+        raise PatternError(f"Invalid axis name '{word}'", pattern, position)
+    raise PatternError(f"Unexpected character '{c}'", pattern, position)
+
+@lru_cache(maxsize=1024)
+def parse_pattern(pattern, anonymous=False):
+    """
+    Parses a rearrange pattern such as 'b (h p) w -> b h (p w)' into a ParsedPattern.
+
+    Parsing is linear in the length of the pattern and its result is cached, so every stage can
+    reuse the same structure instead of re-tokenizing strings.
+
+    Args:
+        pattern (str): einops-like pattern with exactly one '->'.
+        anonymous (bool): accept integers other than 1 as axis names.
+
+    Returns:
+        ParsedPattern: (pattern, input Side, output Side).
+
+    Raises:
+        PatternError: If the pattern is malformed; the error carries the offending position.
+    """
+    sides = _scan(pattern, anonymous=anonymous)
+    if len(sides) != 2:
+        position = len(pattern) if len(sides) < 2 else pattern.find('->', pattern.find('->') + 2)
+        raise PatternError("Expected exactly one '->' (format: input -> output)", pattern, position)
+    return ParsedPattern(pattern, sides[0], sides[1])
+
+@lru_cache(maxsize=256)
+def parse_pack_pattern(pattern):
+    """
+    Parses a pack pattern such as 'b * c', which has no '->' and exactly one '*'.
+
+    Returns:
+        Side: the parsed pattern.
+
+    Raises:
+        PatternError: If the pattern is malformed or contains anything but axis names and one '*'.
+    """
+    sides = _scan(pattern, star=True)
+    if len(sides) != 1:
+        raise PatternError("Pack patterns cannot contain '->'", pattern, pattern.find('->'))
+    side = sides[0]
+    stars = [term for term in side.terms if term.kind == STAR]
+    if len(stars) != 1:
+        position = stars[1].position if stars else len(pattern)
+        raise PatternError("Pack pattern must contain exactly one '*'", pattern, position)
+    for term in side.terms:
+        if term.kind not in (AXIS, STAR):
+            raise PatternError("Pack patterns may only contain axis names and '*'", pattern, term.position)
+    return side
+
+def token_axes(tokens):
+    """
+    Flattens canonical tokens into axis names: ['a', '(b c)'] -> ['a', 'b', 'c'].
+    """
+    return [axis for token in tokens for axis in (token[1:-1].split() if token[0] == '(' else (token,))]
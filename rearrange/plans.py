@@ -0,0 +1,394 @@
+import os
+import threading
+from math import prod
+from .parsing import parse_pattern, GROUP, ELLIPSIS, SINGLETON
+from .validators import Validator
+from .utils import check_extra_arguments
+from .transformations import Recipe
+from .cache import _recipe_cache
+from . import profiling
+
+# Bumped whenever the fields of a Plan change meaning; files with another version are rejected
+PLAN_FORMAT_VERSION = 1
+
+def _compact_recipe(init_shape, axes, final_shape):
+    """
+    Builds an equivalent recipe that transposes as few axes as possible for a concrete shape.
+
+    Size-1 axes are dropped, and axes that stay adjacent and in the same order through the transpose
+    are merged into one, e.g. 'b 1 h w c -> b c (h w)' becomes a transpose of (b, h*w, c).
+    """
+    kept = [axis for axis in range(len(init_shape)) if init_shape[axis] != 1]
+    position = {axis: k for k, axis in enumerate(kept)}
+
+    runs = []
+    for axis in axes:
+        if init_shape[axis] == 1:
+            continue
+        if runs and position[axis] == runs[-1][-1] + 1:
+            runs[-1].append(position[axis])
+        else:
+            runs.append([position[axis]])
+
+    by_input_order = sorted(range(len(runs)), key=lambda r: runs[r][0])
+    rank = {r: k for k, r in enumerate(by_input_order)}
+    compact_shape = tuple([prod([init_shape[kept[k]] for k in runs[r]]) for r in by_input_order])
+    return Recipe(compact_shape, tuple([rank[r] for r in range(len(runs))]), final_shape)
+
+class Plan:
+    """
+    A pattern compiled for inputs with a given number of dimensions, independent of their sizes.
+
+    Which input dimension every elementary axis comes from, the permutation and the grouping of the
+    output only depend on the pattern, ndim and the given axis sizes. recipe(shape) fills in the
+    sizes with a few products and divisions, so one plan serves every batch size and ellipsis extent.
+
+    Attributes:
+        sources: per elementary axis, (input dimension, divisor) or (None, size) for known sizes.
+        checks: (input dimension, size, exact, token) constraints on the input shape: the dimension
+            must equal size if exact, and be divisible by it otherwise.
+        axes: permutation of the elementary axes.
+        groups: per output dimension, the elementary axes merged into it.
+        runs: elementary axes that stay adjacent through the permutation, in input order; each run is
+            merged into one axis of the compact recipe. None if no two axes can be merged. Shapes with
+            size-1 axes get their compact recipe from _compact_recipe instead, since dropping those
+            axes can merge runs that are not adjacent otherwise.
+    """
+
+    __slots__ = ('pattern', 'ndim', 'sources', 'checks', 'axes', 'groups', 'runs', 'compact_axes', '_last')
+
+    def __init__(self, pattern, ndim, sources, checks, axes, groups):
+        self.pattern = pattern
+        self.ndim = ndim
+        self.sources = sources
+        self.checks = checks
+        self.axes = axes
+        self.groups = groups
+        self._last = None
+
+        runs = []
+        for axis in axes:
+            if runs and axis == runs[-1][-1] + 1:
+                runs[-1].append(axis)
+            else:
+                runs.append([axis])
+        if len(runs) == len(axes):
+            self.runs = self.compact_axes = None
+        else:
+            by_input_order = sorted(range(len(runs)), key=lambda r: runs[r][0])
+            rank = {r: k for k, r in enumerate(by_input_order)}
+            self.runs = tuple(tuple(runs[r]) for r in by_input_order)
+            self.compact_axes = tuple(rank[r] for r in range(len(runs)))
+
+    def recipe(self, shape):
+        """
+        Returns the Recipe for a concrete input shape.
+
+        Raises:
+            ValueError: If shape does not have ndim dimensions or does not satisfy the pattern.
+        """
+        last = self._last
+        if last is not None and last[0] == shape:
+            return last[1]
+
+        if len(shape) != self.ndim:
+            raise ValueError(f"Plan for '{self.pattern}' expects {self.ndim} dimensions, got shape {shape}.")
+        for dim, size, exact, token in self.checks:
+            if exact and shape[dim] != size:
+                if token == '1':
+                    raise ValueError(f"Dimension for token '1' must be 1, but got {shape[dim]} at index {dim}.")
+                raise ValueError(f"Product of arguments for {token} ({size}) does not match "
+                                 f"the expected shape {shape[dim]} for token {token}.")
+            if not exact and shape[dim] % size:
+                raise ValueError(f"Could not infer sizes for {token}: dimension {dim} of size {shape[dim]} "
+                                 f"is not divisible by {size}.")
+
+        init_shape = tuple([size if dim is None else shape[dim] // size for dim, size in self.sources])
+        final_shape = tuple([prod([init_shape[axis] for axis in group]) for group in self.groups])
+        compact = None
+        if 1 in init_shape:
+            compact = _compact_recipe(init_shape, self.axes, final_shape)
+        elif self.runs is not None:
+            compact_shape = tuple([prod([init_shape[axis] for axis in run]) for run in self.runs])
+            compact = Recipe(compact_shape, self.compact_axes, final_shape)
+
+        recipe = Recipe(init_shape, self.axes, final_shape, compact)
+        self._last = (shape, recipe)
+        return recipe
+
+    def _input_names(self, parsed):
+        """
+        Returns the names of the elementary axes of every input dimension (None for ellipsis dimensions).
+        """
+        ellipsis_ndim = self.ndim - (len(parsed.input.terms) - parsed.input.has_ellipsis)
+        names = []
+        for term in parsed.input.terms:
+            if term.kind == ELLIPSIS:
+                names.extend([(None,)] * ellipsis_ndim)
+            else:
+                names.append(term.axes)
+        return names
+
+    def axis_sizes(self, shape):
+        """
+        Returns the size of every named axis for an input shape, e.g. {'b': 2, 'h': 4, 'p1': 16}.
+        """
+        sizes = self.recipe(shape).init_shape
+        names = [name for dim in self._input_names(parse_pattern(self.pattern)) for name in dim]
+        return {name: size for name, size in zip(names, sizes) if name is not None}
+
+    def inverse(self, shape):
+        """
+        Returns the plan of the reverse pattern ('output -> input'), with the sizes of every axis that
+        is merged into an output group bound from the forward input shape.
+
+        The reverse plan is derived from this one without validating or inferring anything; the
+        pattern's cached parse only provides the token names. Axes that are alone in their output
+        dimension (e.g. a batch axis or ellipsis dimensions) stay free, so the reverse plan accepts
+        any size for them.
+
+        Raises:
+            ValueError: If shape does not fit this plan.
+        """
+        sizes = self.recipe(shape).init_shape
+        parsed = parse_pattern(self.pattern)
+        ellipsis_ndim = self.ndim - (len(parsed.input.terms) - parsed.input.has_ellipsis)
+
+        # Elementary axes of every input dimension, numbered in input order like self.sources
+        input_groups = []
+        start = 0
+        for names in self._input_names(parsed):
+            input_groups.append(tuple(range(start, start + len(names))))
+            start += len(names)
+        output_tokens = []
+        for term in parsed.output.terms:
+            output_tokens.extend(['...'] * ellipsis_ndim if term.kind == ELLIPSIS else [term.token])
+
+        # The reverse plan's elementary axes follow this plan's output order
+        reverse = {axis: k for k, axis in enumerate(self.axes)}
+        sources = []
+        checks = []
+        for dim, group in enumerate(self.groups):
+            if len(group) == 1:
+                sources.append((dim, 1))
+                continue
+            checks.append((dim, prod([sizes[axis] for axis in group]), True, output_tokens[dim]))
+            sources.extend((None, sizes[axis]) for axis in group)
+        axes = tuple(reverse[axis] for axis in range(len(self.sources)))
+        groups = tuple(tuple(reverse[axis] for axis in group) for group in input_groups)
+        pattern = f"{parsed.output.text} -> {parsed.input.text}"
+        return Plan(pattern, len(self.groups), tuple(sources), tuple(checks), axes, groups)
+
+    def as_dict(self):
+        """
+        Returns the plan as JSON-compatible builtins (see from_dict).
+        """
+        return {
+            'pattern': self.pattern,
+            'ndim': self.ndim,
+            'sources': [list(source) for source in self.sources],
+            'checks': [list(check) for check in self.checks],
+            'axes': list(self.axes),
+            'groups': [list(group) for group in self.groups],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds a plan from as_dict() output, checking that its fields are consistent.
+
+        Raises:
+            ValueError: If data does not describe a valid plan.
+        """
+        try:
+            sources = tuple((dim, size) for dim, size in data['sources'])
+            checks = tuple((dim, size, bool(exact), str(token)) for dim, size, exact, token in data['checks'])
+            axes = tuple(data['axes'])
+            groups = tuple(tuple(group) for group in data['groups'])
+            pattern, ndim = str(data['pattern']), data['ndim']
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid plan data: {e!r}.") from None
+
+        flat = [axis for group in groups for axis in group]
+        integers = [ndim, *axes, *flat, *[v for source in sources for v in source if v is not None],
+                    *[v for check in checks for v in check[:2]]]
+        if not all(type(value) is int and value >= 0 for value in integers):
+            raise ValueError(f"Invalid plan data for '{pattern}': expected non-negative integers.")
+        if (sorted(axes) != list(range(len(sources))) or flat != list(axes)
+                or any(dim is not None and (dim >= ndim or size == 0) for dim, size in sources)
+                or any(check[0] >= ndim for check in checks)):
+            raise ValueError(f"Invalid plan data for '{pattern}': inconsistent axes, groups or dimensions.")
+        return cls(pattern, ndim, sources, checks, axes, groups)
+
+    def __reduce__(self):
+        # The merge runs are derived in __init__ and the shape memo is not worth shipping
+        return type(self), (self.pattern, self.ndim, self.sources, self.checks, self.axes, self.groups)
+
+    def __repr__(self):
+        return f"<Plan {self.pattern!r} ndim={self.ndim}>"
+
+def _axis_sizes(kwargs):
+    """
+    Converts axis sizes to Python ints, so plans, cache keys and plan files never hold NumPy scalars.
+    """
+    sizes = {}
+    for axis, size in kwargs.items():
+        try:
+            sizes[axis] = int(size)
+        except (TypeError, ValueError):
+            raise ValueError(f"Size of axis '{axis}' must be an integer, got {size!r}.") from None
+        if sizes[axis] != size:
+            raise ValueError(f"Size of axis '{axis}' must be an integer, got {size!r}.")
+    return sizes
+
+def build_plan(pattern, ndim, **kwargs):
+    """
+    Validates a pattern against the number of input dimensions and the given axis sizes, and
+    compiles it into a Plan.
+
+    Args:
+        pattern (str): einops-like pattern.
+        ndim (int): number of dimensions of the inputs.
+        kwargs: axis sizes, as accepted by rearrange().
+
+    Returns:
+        Plan: the compiled plan.
+
+    Raises:
+        ValueError: If the pattern, the number of dimensions or the sizes are invalid.
+    """
+    clock = profiling.stage_clock(pattern)
+    kwargs = _axis_sizes(kwargs)
+    v = Validator.from_shape((), pattern, **kwargs)
+    if clock is not None:
+        clock.lap('parse')
+    v.ellipsis_checker()
+    v.identified_match_checker()
+    parsed = v.parsed
+    terms = parsed.input.terms
+    check_extra_arguments({term.token: None for term in terms}, **kwargs)
+
+    explicit = len(terms) - parsed.input.has_ellipsis
+    if not parsed.input.has_ellipsis and explicit != ndim:
+        raise ValueError(f"Number of input tokens ({explicit}) must match the array dimensions ({ndim}) unless using ellipsis ('...').")
+    if explicit > ndim:
+        raise ValueError(f"Pattern with ellipsis ('...') must not have more explicit tokens ({explicit}) than array dimensions ({ndim}).")
+    ellipsis_ndim = ndim - explicit
+    if clock is not None:
+        clock.lap('validate')
+
+    sources = []
+    checks = []
+    position = {}
+    dim = 0
+    for term in terms:
+        if term.kind == ELLIPSIS:
+            for k in range(ellipsis_ndim):
+                position[k] = len(sources)
+                sources.append((dim, 1))
+                dim += 1
+            continue
+        if term.kind == SINGLETON:
+            checks.append((dim, 1, True, '1'))
+        elif term.kind == GROUP:
+            unknown = [axis for axis in term.axes if axis not in kwargs]
+            known = prod(kwargs[axis] for axis in term.axes if axis in kwargs)
+            if len(unknown) > 1:
+                raise ValueError(f"Could not infer sizes for {unknown} in {term.token}: "
+                                 f"at most one axis of a group can be inferred.")
+            if unknown and known == 0:
+                raise ValueError(f"Could not infer sizes for {unknown} in {term.token}: the other sizes multiply to 0.")
+            checks.append((dim, known, not unknown, term.token))
+            for axis in term.axes:
+                position[axis] = len(sources)
+                sources.append((dim, known) if axis in unknown else (None, kwargs[axis]))
+        else:
+            position[term.axes[0]] = len(sources)
+            sources.append((dim, 1))
+        dim += 1
+
+    axes = []
+    groups = []
+    for term in parsed.output.terms:
+        if term.kind == ELLIPSIS:
+            for k in range(ellipsis_ndim):
+                axes.append(position[k])
+                groups.append((position[k],))
+        else:
+            group = tuple(position[axis] for axis in term.axes)
+            axes.extend(group)
+            groups.append(group)
+
+    plan = Plan(pattern, ndim, tuple(sources), tuple(checks), tuple(axes), tuple(groups))
+    if clock is not None:
+        clock.lap('plan')
+    return plan
+
+def save_plans(path):
+    """
+    Writes every plan of the global cache to a versioned JSON file, so other processes can start
+    with a warm cache (see load_plans).
+
+    Args:
+        path (str or os.PathLike): file to create or overwrite.
+
+    Returns:
+        int: the number of plans written.
+    """
+    import json
+    entries = [{'kwargs': dict(kwargs), 'plan': plan.as_dict()}
+               for (pattern, ndim, kwargs), plan in _recipe_cache.items()]
+    # Written next to path and moved into place, so a failed save never leaves a truncated file
+    temporary = f"{os.fspath(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, 'w') as f:
+            json.dump({'format': 'rearrange-plans', 'version': PLAN_FORMAT_VERSION, 'plans': entries}, f)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return len(entries)
+
+def load_plans(path):
+    """
+    Loads plans written by save_plans into the global cache, so the first calls with these patterns
+    are cache hits. The file is plain JSON: loading never executes code, and every plan is checked
+    for consistency before being cached.
+
+    Args:
+        path (str or os.PathLike): file written by save_plans.
+
+    Returns:
+        int: the number of plans loaded.
+
+    Raises:
+        ValueError: If the file is not a plan file, was written by an incompatible version, or
+            contains an invalid plan. Nothing is loaded in that case.
+    """
+    import json
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{os.fspath(path)} is not a plan file: {e}.") from None
+    if not isinstance(data, dict) or data.get('format') != 'rearrange-plans':
+        raise ValueError(f"{os.fspath(path)} is not a plan file.")
+    if data.get('version') != PLAN_FORMAT_VERSION:
+        raise ValueError(f"{os.fspath(path)} holds plans of format version {data.get('version')!r}, "
+                         f"expected {PLAN_FORMAT_VERSION}; save the plans again with this version.")
+
+    loaded = []
+    for entry in data.get('plans', ()):
+        try:
+            plan, kwargs = entry['plan'], entry['kwargs']
+            kwargs = tuple(sorted(kwargs.items()))
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"{os.fspath(path)} contains an invalid entry: {entry!r}.") from None
+        if not all(type(size) is int for _, size in kwargs):
+            raise ValueError(f"{os.fspath(path)} contains non-integer axis sizes: {dict(kwargs)!r}.")
+        plan = Plan.from_dict(plan)
+        loaded.append(((plan.pattern, plan.ndim, kwargs), plan))
+    for key, plan in loaded:
+        _recipe_cache.put(key, plan)
+    return len(loaded)
@@ -0,0 +1,199 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter_ns
+import numpy as np
+
+# Stages of a call, in execution order. parse/validate/plan only run on a cache miss; shapes computes
+# the concrete recipe from the cached plan.
+STAGES = ('lookup', 'parse', 'validate', 'plan', 'shapes', 'execute')
+_NESTED_STAGES = ('parse', 'validate', 'plan', 'shapes')
+
+class PatternStats:
+    """
+    Counters collected for one pattern while profiling.
+
+    Attributes:
+        calls: number of rearranges executed.
+        cache_hits / cache_misses: plan cache lookups (misses are followed by compilation).
+        views / copies: results that share memory with the input, and results that were materialized.
+        bytes_moved: bytes written by copies.
+        stage_ns: nanoseconds spent per stage (see STAGES).
+    """
+
+    __slots__ = ('calls', 'cache_hits', 'cache_misses', 'views', 'copies', 'bytes_moved', 'stage_ns')
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.views = 0
+        self.copies = 0
+        self.bytes_moved = 0
+        self.stage_ns = dict.fromkeys(STAGES, 0)
+
+    def as_dict(self):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values['stage_ns'] = dict(self.stage_ns)
+        return values
+
+    def __repr__(self):
+        return f"PatternStats({self.as_dict()})"
+
+class Stats:
+    """
+    Runtime statistics collected by profile(), keyed by pattern.
+
+    Counters are updated without locking, so totals from concurrent threads may be slightly off.
+    """
+
+    def __init__(self):
+        self.patterns = {}
+
+    def record(self, pattern):
+        """
+        Returns the PatternStats of pattern, creating it on first use.
+        """
+        record = self.patterns.get(pattern)
+        if record is None:
+            record = self.patterns.setdefault(pattern, PatternStats())
+        return record
+
+    def __getitem__(self, pattern):
+        return self.patterns[pattern]
+
+    def as_dict(self):
+        return {pattern: record.as_dict() for pattern, record in self.patterns.items()}
+
+    def report(self):
+        """
+        Formats the statistics as a table, one row per pattern, with per-stage times in microseconds.
+        """
+        header = f"{'pattern':<40} {'calls':>6} {'hits':>6} {'misses':>6} {'views':>6} {'copies':>6} {'MB moved':>9}"
+        header += "".join(f" {stage + ' us':>11}" for stage in STAGES)
+        lines = [header]
+        for pattern, r in self.patterns.items():
+            line = (f"{pattern:<40} {r.calls:>6} {r.cache_hits:>6} {r.cache_misses:>6} {r.views:>6} "
+                    f"{r.copies:>6} {r.bytes_moved / 1e6:>9.2f}")
+            line += "".join(f" {r.stage_ns[stage] / 1e3:>11.1f}" for stage in STAGES)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"Stats({len(self.patterns)} patterns)"
+
+# Number of open profile() blocks in the process. Instrumented code checks this first, so disabled
+# profiling costs a single global lookup; only then does it look up the Stats of its own context.
+_open_blocks = 0
+_open_blocks_lock = threading.Lock()
+
+# Stats being collected, and those of the last finished block, per context: every thread (and asyncio
+# task) only records into the blocks it opened itself
+_active = ContextVar('rearrange_profile_active', default=None)
+_last = ContextVar('rearrange_profile_last', default=None)
+
+@contextmanager
+def profile():
+    """
+    Collects per-pattern statistics for the rearranges run inside the block.
+
+    Blocks are scoped to the current thread or asyncio task (a contextvars context): rearranges run
+    by other threads are not recorded, and several threads can profile concurrently. Blocks nest; the
+    innermost one collects.
+
+    Example:
+        with profile() as stats:
+            rearrange(x, 'b c h w -> b h w c')
+        print(stats.report())
+
+    Yields:
+        Stats: filled in while the block runs.
+    """
+    global _open_blocks
+    collected = Stats()
+    token = _active.set(collected)
+    with _open_blocks_lock:
+        _open_blocks += 1
+    try:
+        yield collected
+    finally:
+        with _open_blocks_lock:
+            _open_blocks -= 1
+        _active.reset(token)
+        _last.set(collected)
+
+def stats():
+    """
+    Returns the Stats being collected by the innermost active profile() block of the current thread
+    or task, or those of its most recently finished one. Returns None if it never enabled profiling.
+    """
+    active = _active.get()
+    return active if active is not None else _last.get()
+
+class _StageClock:
+    """
+    Accumulates the time elapsed since the previous lap into a stage of a PatternStats.
+    """
+
+    __slots__ = ('record', 'last')
+
+    def __init__(self, record):
+        self.record = record
+        self.last = perf_counter_ns()
+
+    def lap(self, stage):
+        now = perf_counter_ns()
+        self.record.stage_ns[stage] += now - self.last
+        self.last = now
+
+def stage_clock(pattern):
+    """
+    Returns a clock timing the stages of pattern, or None when profiling is disabled.
+    """
+    active = _active.get()
+    if active is None:
+        return None
+    return _StageClock(active.record(pattern))
+
+def count_lookup(pattern, hit):
+    active = _active.get()
+    if active is not None:
+        record = active.record(pattern)
+        if hit:
+            record.cache_hits += 1
+        else:
+            record.cache_misses += 1
+
+def _shares_memory(array, result):
+    if isinstance(array, np.ndarray) and isinstance(result, np.ndarray):
+        return np.may_share_memory(array, result)
+    if hasattr(array, 'untyped_storage') and hasattr(result, 'untyped_storage'):
+        return array.untyped_storage().data_ptr() == result.untyped_storage().data_ptr()
+    return None
+
+def profiled_call(pattern, array, shape, get_recipe, execute):
+    """
+    Runs get_recipe(shape) and execute(recipe) while recording their times, and classifies the result
+    as a view or a copy. Stages timed inside get_recipe are not counted as lookup time.
+    """
+    record = _active.get().record(pattern)
+    nested_ns = sum(record.stage_ns[stage] for stage in _NESTED_STAGES)
+
+    start = perf_counter_ns()
+    recipe = get_recipe(shape)
+    looked_up = perf_counter_ns()
+    result = execute(recipe)
+    done = perf_counter_ns()
+
+    nested = sum(record.stage_ns[stage] for stage in _NESTED_STAGES) - nested_ns
+    record.stage_ns['lookup'] += looked_up - start - nested
+    record.stage_ns['execute'] += done - looked_up
+    record.calls += 1
+
+    shared = _shares_memory(array, result)
+    if shared is True:
+        record.views += 1
+    elif shared is False:
+        record.copies += 1
+        record.bytes_moved += result.nbytes
+    return result
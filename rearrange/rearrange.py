@@ -1,37 +1,383 @@
-from .validators import Validator
-from .utils import check_extra_arguments, get_additional_args
-from .transformations import input_based_transformation, update_input_tokens_mapping, Output_Transformations
+from functools import lru_cache
+import numpy as np
+from .parsing import parse_pattern, token_axes, AXIS, GROUP
+from .plans import build_plan, _axis_sizes
+from .transformations import apply_recipe, write_recipe, reshape_is_view, _select_recipe
+from .cache import _recipe_cache
+from .backends import get_backend
+from .utils import to_numpy_array
+from .engines import get_copy_function, get_num_workers
+from . import profiling
 
-def rearrange(array, pattern, **kwargs):
+def _get_plan(ndim, pattern, kwargs):
+    """
+    Looks up the plan for (pattern, ndim, kwargs) in the global cache, compiling it on a miss.
+    """
+    # NumPy integers hash and compare like ints, so they hit the entries stored under int keys
+    key = (pattern, ndim, tuple(sorted(kwargs.items())))
+    plan = _recipe_cache.get(key)
+    if profiling._open_blocks and profiling._active.get() is not None:
+        profiling.count_lookup(pattern, plan is not None)
+    if plan is None:
+        plan = build_plan(pattern, ndim, **kwargs)
+        _recipe_cache.put((pattern, ndim, tuple(sorted(_axis_sizes(kwargs).items()))), plan)
+    return plan
+
+def _get_recipe(shape, pattern, kwargs):
+    """
+    Returns the recipe for an input shape, computed from the cached plan of (pattern, ndim, kwargs).
+    """
+    plan = _get_plan(len(shape), pattern, kwargs)
+    if profiling._open_blocks and profiling._active.get() is not None:
+        clock = profiling.stage_clock(pattern)
+        recipe = plan.recipe(shape)
+        clock.lap('shapes')
+        return recipe
+    return plan.recipe(shape)
+
+def _to_array(array, dtype=None):
+    """
+    Returns the backend of array and array converted to its native type, honouring the dtype= hint
+    (see to_numpy_array), which is only supported for inputs rearranged through NumPy.
+    """
+    backend = get_backend(array)
+    if dtype is None:
+        return backend, backend.to_array(array)
+    if backend.name != 'numpy':
+        raise TypeError(f"dtype= is only supported for inputs rearranged through NumPy, got {type(array)}.")
+    return backend, to_numpy_array(array, dtype=dtype)
+
+_ORDERS = ('keep', 'C', 'F')
+
+def _check_order(order):
+    if order not in _ORDERS:
+        raise ValueError(f"Invalid order {order!r}. Expected one of {_ORDERS}.")
+
+def _as_view(array, recipe, order='keep'):
+    """
+    Returns the result of a recipe as a view of a NumPy array, or None if it needs a copy (because of
+    the grouping, or to honour order).
+    """
+    # Splitting axes and adding/removing singletons never copies; only the final grouping can
+    recipe = _select_recipe(array, recipe)
+    source = array.reshape(recipe.init_shape).transpose(recipe.axes)
+    if reshape_is_view(source.shape, source.strides, recipe.final_shape):
+        result = source.reshape(recipe.final_shape)
+        if order == 'keep' or (order == 'C' and result.flags.c_contiguous) or (order == 'F' and result.flags.f_contiguous):
+            return result
+    return None
+
+def _execute(array, recipe, backend, out=None, order='keep', copy=None, engine='numpy', workers=None, dtype=None):
+    """
+    Applies a recipe, honouring the out=, order=, copy=, engine=, workers= and dtype= options of rearrange().
+    """
+    cast = dtype is not None and np.dtype(dtype) != array.dtype
+    if out is None and order == 'keep' and copy is None and engine == 'numpy' and not cast:
+        if (workers is None and get_num_workers() == 1) or workers == 1 or not isinstance(array, np.ndarray):
+            return apply_recipe(array, recipe, backend)
+
+    if not isinstance(array, np.ndarray):
+        raise TypeError(f"out=, order=, copy= and engine= are only supported for NumPy arrays, got {type(array)}.")
+
+    # The cast happens inside the copy that materializes the result, like astype() would
+    copyto = get_copy_function(engine, workers, casting='unsafe' if cast else 'same_kind')
+
+    if out is not None:
+        if copy is False:
+            raise ValueError("copy=False cannot be combined with out=, which always copies.")
+        if dtype is not None and out.dtype != dtype:
+            raise ValueError(f"Output buffer has dtype {out.dtype}, but dtype={np.dtype(dtype)} was given.")
+        return write_recipe(array, recipe, out, copyto)
+
+    # A cast always copies: it satisfies copy=True and can never honour copy=False
+    if cast and copy is False:
+        raise ValueError(f"Casting {array.dtype} to {np.dtype(dtype)} requires a copy, but copy=False was given.")
+
+    if copy is not True or cast:
+        view = _as_view(array, recipe, order)
+        if view is not None and not cast:
+            return view
+        if view is not None:
+            # A single cast copy that keeps the memory order of the view, like astype()
+            result = np.empty_like(view, dtype=dtype)
+            copyto(result, view)
+            return result
+
+    if copy is False:
+        raise ValueError(f"Rearranging an array of shape {array.shape} into {recipe.final_shape} "
+                         f"{'with order=' + repr(order) + ' ' if order != 'keep' else ''}requires a copy, "
+                         f"but copy=False was given.")
+
+    layout = 'C' if order == 'keep' else order
+    result = np.empty(recipe.final_shape, dtype=dtype if cast else array.dtype, order=layout)
+    return write_recipe(array, recipe, result, copyto)
+
+def rearrange(array, pattern, out=None, order='keep', copy=None, engine='numpy', workers=None, dtype=None, **kwargs):
     """
     Rearranges an array based on the einops-like pattern and additional arguments.
 
     Steps:
     1. Validate the input array and pattern.
     2. Process extra arguments and parentheses.
-    3. Perform input-based transformations.
-    4. Update input tokens mapping based on transformations.
-    5. Apply output transformations.
-    6. Return the final transformed array.
+    3. Collapse the input, singleton and output transformations into a reshape/transpose/reshape recipe.
+    4. Apply the recipe and return the transformed array.
+
+    Steps 1-3 produce a plan that only depends on the number of dimensions, cached per (pattern, ndim,
+    kwargs); each call merely computes the shapes of step 4 from the concrete input shape, so varying
+    batch sizes and ellipsis extents reuse the same plan.
+    Per-stage timings, cache hits and copies can be collected with profile().
+    PyTorch tensors are rearranged natively and returned as tensors; everything else goes through NumPy.
+
+    Memory layout (NumPy arrays only):
+    - out: preallocated array with the output shape. The result is written into it with a single copy
+      and out is returned.
+    - order: 'keep' (default) returns a view whenever possible, 'C' / 'F' guarantee a C / Fortran
+      contiguous result, copying only if needed. Ignored when out is given.
+    - copy: None (default) copies only if needed, True always returns a fresh array and False never
+      copies, raising a ValueError before anything is allocated if a view is impossible.
+    - engine: how copies are materialized. 'numpy' (default) uses a single strided copy, 'tiled'
+      copies cache-sized tiles, which is much faster for large transposing rearranges.
+    - workers: number of threads filling a copy (-1 for all cores). Defaults to set_num_workers(),
+      which is 1. Copies below engines.PARALLEL_THRESHOLD bytes always stay on the calling thread.
+
+    Inputs (NumPy only):
+    - Lists, and objects exposing __array_interface__, __dlpack__ or the buffer protocol (memoryview,
+      bytearray, array.array, PyArrow buffers...) are accepted; all but lists are wrapped without copying.
+    - dtype: dtype of the result. Lists are built with it and raw byte buffers are viewed as it (see
+      to_numpy_array); other inputs are cast in the same pass that materializes the result, so
+      rearrange(x, p, dtype=np.float16) moves the data once where rearrange(x, p).astype(np.float16)
+      moves it twice. A cast always returns a new array (and fails with copy=False).
+
+    `out`, `order`, `copy`, `engine`, `workers` and `dtype` are reserved and cannot be used as axis names.
+    """
+
+    _check_order(order)
+    backend, array = _to_array(array, dtype)
+    if profiling._open_blocks and profiling._active.get() is not None:
+        return profiling.profiled_call(
+            pattern, array, backend.shape(array),
+            lambda shape: _get_recipe(shape, pattern, kwargs),
+            lambda recipe: _execute(array, recipe, backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype))
+    recipe = _get_recipe(backend.shape(array), pattern, kwargs)
+    return _execute(array, recipe, backend, out=out, order=order, copy=copy, engine=engine, workers=workers, dtype=dtype)
+
+
+def rearrange_many(arrays, pattern, stack=False, out=None, engine='numpy', workers=None, **kwargs):
+    """
+    Rearranges many identically-shaped arrays with the same pattern, validating it only once.
+
+    Args:
+        arrays (sequence): arrays sharing one shape (and backend).
+        pattern (str): einops-like pattern.
+        stack (bool): if True, write the results into one array of shape (len(arrays), *output_shape).
+        out (np.ndarray, optional): preallocated buffer of shape (len(arrays), *output_shape) to write into.
+            Implies stack=True.
+        engine (str): copy engine used to fill the stacked output, as in rearrange().
+        workers (int): threads used to fill the stacked output, as in rearrange().
+        kwargs: axis sizes, as accepted by rearrange(). `stack`, `out`, `engine` and `workers` are reserved
+            and cannot be used as axis names.
+
+    Returns:
+        list or np.ndarray: the rearranged arrays, or the stacked output.
+
+    Raises:
+        ValueError: If the arrays do not share one shape, or out has the wrong shape.
+        TypeError: If stacking is requested for non-NumPy arrays.
     """
 
-    v = Validator(array, pattern, **kwargs)
+    if len(arrays) == 0:
+        if out is not None or stack:
+            raise ValueError("Cannot stack an empty sequence of arrays.")
+        return []
 
-    array, input_tokens_mapping, input_tokens_shape_mapping, output_tokens_mapping = v.validate_and_return()
+    backend = get_backend(arrays[0])
+    arrays = [backend.to_array(array) for array in arrays]
+    shape = backend.shape(arrays[0])
+    for array in arrays[1:]:
+        if backend.shape(array) != shape:
+            raise ValueError(f"All arrays must share one shape, got {shape} and {backend.shape(array)}.")
 
-    check_extra_arguments(input_tokens_mapping, **kwargs)
-    all_args = get_additional_args(input_tokens_mapping, input_tokens_shape_mapping, **kwargs)
+    copyto = get_copy_function(engine, workers)
+    recipe = _get_recipe(shape, pattern, kwargs)
 
-    transformed_array = input_based_transformation(
-                                                array,
-                                                input_tokens_mapping,
-                                                input_tokens_shape_mapping,
-                                                **all_args)
+    if out is None and not stack:
+        return [apply_recipe(array, recipe, backend) for array in arrays]
+
+    if not all(isinstance(array, np.ndarray) for array in arrays):
+        raise TypeError("Stacked output is only supported for NumPy arrays.")
+
+    stacked_shape = (len(arrays),) + recipe.final_shape
+    if out is None:
+        out = np.empty(stacked_shape, dtype=np.result_type(*arrays))
+    elif out.shape != stacked_shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {stacked_shape}.")
+
+    for i, array in enumerate(arrays):
+        write_recipe(array, recipe, out[i], copyto)
+    return out
+
+def will_copy(pattern, shape, **kwargs):
+    """
+    Predicts whether rearranging a C-contiguous array of the given shape has to copy its data.
 
-    updated_tokens_mapping = update_input_tokens_mapping(
-        input_tokens_mapping,
-        **all_args,
-    )
+    Args:
+        pattern (str): einops-like pattern.
+        shape (tuple): input shape.
+        kwargs: axis sizes, as accepted by rearrange().
+
+    Returns:
+        bool: True if rearrange() would return a copy, False if it returns a view.
+    """
+    recipe = _get_recipe(tuple(shape), pattern, kwargs)
+    strides = [1] * len(recipe.init_shape)
+    for i in range(len(recipe.init_shape) - 2, -1, -1):
+        strides[i] = strides[i + 1] * recipe.init_shape[i + 1]
+    transposed_shape = [recipe.init_shape[axis] for axis in recipe.axes]
+    transposed_strides = [strides[axis] for axis in recipe.axes]
+    return not reshape_is_view(transposed_shape, transposed_strides, recipe.final_shape)
+
+REDUCTIONS = ('sum', 'mean', 'max', 'min', 'prod')
+
+def _name_anonymous_axes(side, used, anonymous):
+    """
+    Returns the tokens of a parsed side with anonymous axes (integers other than 1) replaced by
+    generated names, recording their sizes in anonymous.
+    """
+    def name(axis):
+        if not axis.isdigit():
+            return axis
+        generated = f"anon{len(anonymous) + 1}"
+        while generated in used:
+            generated = 'x' + generated
+        anonymous[generated] = int(axis)
+        return generated
+
+    tokens = []
+    for term in side.terms:
+        if term.kind == GROUP:
+            tokens.append(f"({' '.join(name(axis) for axis in term.axes)})")
+        elif term.kind == AXIS:
+            tokens.append(name(term.axes[0]))
+        else:
+            tokens.append(term.token)
+    return tokens
+
+@lru_cache(maxsize=256)
+def _reduction_pattern(pattern):
+    """
+    Turns a reduction pattern into an equivalent rearrange pattern that keeps the reduced axes,
+    appended at the end of the output.
+
+    Anonymous axes such as the 2 in '(h 2)' are given generated names and their sizes.
+
+    Returns:
+        tuple: (rearrange pattern, sizes of anonymous axes, number of reduced axes)
+    """
+    parsed = parse_pattern(pattern, anonymous=True)
+    anonymous = {}
+    input_tokens = _name_anonymous_axes(parsed.input, set(parsed.input.axes + parsed.output.axes), anonymous)
+
+    kept = set(parsed.output.axes)
+    reduced = [axis for axis in token_axes(input_tokens) if axis not in kept and axis not in ('1', '...')]
+
+    return f"{' '.join(input_tokens)} -> {' '.join(parsed.output.tokens + tuple(reduced))}", anonymous, len(reduced)
+
+def reduce(array, pattern, reduction, **kwargs):
+    """
+    Reduces the axes that disappear from the output of an einops-like pattern.
+
+    The reduction runs directly on the reshaped and transposed view of the input, so no rearranged
+    copy of the input is ever made. Only the (smaller) reduced result is materialized.
+
+    Example:
+        reduce(x, 'b c (h 2) (w 2) -> b c h w', 'mean')   # 2x2 average pooling
+        reduce(x, 'b t c -> b c', 'max')
+
+    Args:
+        array: array to reduce (NumPy array, list, torch tensor or any registered backend).
+        pattern (str): einops-like pattern whose output omits the reduced axes. Anonymous axes
+            like '2' may appear inside input parentheses.
+        reduction (str): one of 'sum', 'mean', 'max', 'min', 'prod'.
+        kwargs: axis sizes, as accepted by rearrange().
+
+    Returns:
+        The reduced array.
+
+    Raises:
+        ValueError: If the pattern, the sizes or the reduction are invalid.
+    """
+    if reduction not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction {reduction!r}. Expected one of {REDUCTIONS}.")
+
+    full_pattern, anonymous, n_reduced = _reduction_pattern(pattern)
+    backend = get_backend(array)
+    array = backend.to_array(array)
+    recipe = _get_recipe(backend.shape(array), full_pattern, {**kwargs, **anonymous})
+
+    if n_reduced == 0:
+        return apply_recipe(array, recipe, backend)
+
+    # The reduced axes are the trailing ones of the transposed view. The compact recipe is not used
+    # since it could merge a kept axis with a reduced one.
+    source = backend.transpose(backend.reshape(array, recipe.init_shape), recipe.axes)
+    ndim = len(recipe.axes)
+    result = backend.reduce(source, reduction, tuple(range(ndim - n_reduced, ndim)))
+    return backend.reshape(result, recipe.final_shape[:len(recipe.final_shape) - n_reduced])
+
+@lru_cache(maxsize=256)
+def _repeat_pattern(pattern):
+    """
+    Turns a repeat pattern into an equivalent rearrange pattern whose input has the new axes
+    appended, to be applied to the input broadcast along them.
+
+    Anonymous axes such as the 3 in 'h w -> h w 3' are given generated names and their sizes.
+
+    Returns:
+        tuple: (rearrange pattern, names of the new axes, sizes of anonymous axes)
+    """
+    parsed = parse_pattern(pattern, anonymous=True)
+    anonymous = {}
+    output_tokens = _name_anonymous_axes(parsed.output, set(parsed.input.axes + parsed.output.axes), anonymous)
+
+    existing = set(parsed.input.axes)
+    new_axes = tuple(axis for axis in token_axes(output_tokens) if axis not in existing and axis not in ('1', '...'))
+
+    return f"{' '.join(parsed.input.tokens + new_axes)} -> {' '.join(output_tokens)}", new_axes, anonymous
+
+def repeat(array, pattern, **kwargs):
+    """
+    Repeats an array along axes that only appear in the output of an einops-like pattern.
+
+    The input is broadcast along the new axes, so as long as a new axis is not merged with other
+    axes the result is a stride-0 view that costs no memory (read-only for NumPy arrays). Only
+    groupings such as '(c h)' that interleave a repeated axis force a copy.
+
+    Example:
+        repeat(mask, 'h w -> h w c', c=3)        # view
+        repeat(x, 'h w -> (h 2) w')              # copy, every row twice
+
+    Args:
+        array: array to repeat (NumPy array, list, torch tensor or any registered backend).
+        pattern (str): einops-like pattern whose output adds new axes. Anonymous axes like '2' may
+            appear in the output.
+        kwargs: sizes of the new axes, plus axis sizes as accepted by rearrange().
+
+    Returns:
+        The repeated array.
+
+    Raises:
+        ValueError: If the pattern is invalid or the size of a new axis is missing.
+    """
+    full_pattern, new_axes, anonymous = _repeat_pattern(pattern)
+    kwargs = {**kwargs, **anonymous}
+    missing = [axis for axis in new_axes if axis not in kwargs]
+    if missing:
+        raise ValueError(f"Sizes of new axes {missing} must be provided.")
+    sizes = tuple(kwargs.pop(axis) for axis in new_axes)
 
-    d = Output_Transformations(transformed_array, token_mapping=updated_tokens_mapping, output_mapping=output_tokens_mapping)
-    return d.transform()
\ No newline at end of file
+    backend = get_backend(array)
+    array = backend.to_array(array)
+    shape = tuple(backend.shape(array))
+    expanded = backend.broadcast_to(backend.reshape(array, shape + (1,) * len(sizes)), shape + sizes)
+    recipe = _get_recipe(shape + sizes, full_pattern, kwargs)
+    return apply_recipe(expanded, recipe, backend)
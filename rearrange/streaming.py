@@ -0,0 +1,225 @@
+import mmap
+import os
+from math import prod
+import numpy as np
+from .rearrange import _get_recipe
+from .compiled import compile_pattern
+from .parsing import parse_pattern
+from .utils import to_numpy_array
+from .transformations import _select_recipe
+from .engines import get_copy_function
+
+def _iter_blocks(shape, itemsize, chunk_bytes):
+    """
+    Splits a C-ordered array of the given shape into blocks of at most chunk_bytes (but at least one
+    element), yielded in memory order as tuples of indices/slices.
+
+    Every block covers whole trailing axes, so it is one contiguous byte range of the array.
+    """
+    inner = itemsize
+    k = len(shape)
+    while k > 0 and inner * shape[k - 1] <= chunk_bytes:
+        inner *= shape[k - 1]
+        k -= 1
+    if k == 0:
+        yield ()
+        return
+
+    step = max(1, chunk_bytes // inner)
+    for outer in np.ndindex(*shape[:k - 1]):
+        for start in range(0, shape[k - 1], step):
+            yield outer + (slice(start, start + step),)
+
+def _release_pages(array):
+    """
+    Drops the resident pages of a read-only memory-mapped array so reading it does not grow the RSS.
+    Clean file-backed pages are simply re-read from the page cache if touched again. Writable and
+    copy-on-write maps are left alone, since dropping their pages could lose modifications.
+    """
+    if getattr(array, 'mode', None) != 'r':
+        return
+    base = array
+    while base is not None and not isinstance(base, mmap.mmap):
+        base = getattr(base, 'base', None)
+    if base is not None and hasattr(mmap, 'MADV_DONTNEED'):
+        base.madvise(mmap.MADV_DONTNEED)
+
+def rearrange_to_file(src, dst_path, pattern, chunk_bytes=64 * 2**20, engine='numpy', **kwargs):
+    """
+    Rearranges an array that may be larger than memory and writes the result to a new .npy file.
+
+    The source is memory-mapped and the output is written sequentially, one block of at most
+    chunk_bytes at a time. Source pages are released after each block, so peak memory is a small
+    multiple of chunk_bytes regardless of the array size.
+
+    Args:
+        src (str, os.PathLike or np.ndarray): path of a .npy file, or an array (typically np.memmap).
+        dst_path (str or os.PathLike): path of the .npy file to create.
+        pattern (str): einops-like pattern.
+        chunk_bytes (int): size of the blocks copied at once.
+        engine (str): copy engine used for each block, as in rearrange().
+        kwargs: axis sizes, as accepted by rearrange(). `chunk_bytes` and `engine` are reserved and
+            cannot be used as axis names.
+
+    Returns:
+        np.memmap: the result, memory-mapped read-only from dst_path.
+
+    Raises:
+        TypeError: If src is neither a path nor a NumPy array.
+        ValueError: If chunk_bytes is not positive.
+    """
+    if chunk_bytes <= 0:
+        raise ValueError(f"chunk_bytes must be positive, got {chunk_bytes}.")
+    if isinstance(src, (str, os.PathLike)):
+        src = np.load(src, mmap_mode='r')
+    elif not isinstance(src, np.ndarray):
+        raise TypeError(f"Expected a .npy path or a NumPy array, got {type(src)}.")
+
+    copyto = get_copy_function(engine, workers=1)
+    recipe = _get_recipe(src.shape, pattern, kwargs)
+    recipe = _select_recipe(src, recipe)
+    source = src.reshape(recipe.init_shape).transpose(recipe.axes)
+
+    buffer = np.empty(max(1, min(source.size, chunk_bytes // src.itemsize)), dtype=src.dtype)
+
+    with open(dst_path, 'wb') as f:
+        header = {
+            'descr': np.lib.format.dtype_to_descr(src.dtype),
+            'fortran_order': False,
+            'shape': recipe.final_shape,
+        }
+        np.lib.format.write_array_header_1_0(f, header)
+
+        if source.size > 0:
+            for block in _iter_blocks(source.shape, src.itemsize, chunk_bytes):
+                chunk = source[block]
+                if chunk.size > buffer.size:
+                    buffer = np.empty(chunk.size, dtype=src.dtype)
+                staged = buffer[:chunk.size].reshape(chunk.shape)
+                copyto(staged, chunk)
+                f.write(staged.data)
+                _release_pages(src)
+
+    return np.load(dst_path, mmap_mode='r')
+
+def _leading_axis(side):
+    """
+    Returns the outermost elementary axis of a parsed pattern side ('t' for 't h w' or '(t c) h w'),
+    or None if the side does not start with an axis or group.
+    """
+    if not side.terms or not side.terms[0].axes:
+        return None
+    return side.terms[0].axes[0]
+
+def rearrange_stream(chunks, pattern, axis_name='t', max_chunks=1, out=None, **kwargs):
+    """
+    Rearranges data arriving as an iterable of chunks split along the leading input axis.
+
+    The pattern is validated once, up front. axis_name must be the outermost axis of the first input
+    token, e.g. 't' in 't h w' or '(t c) h w'.
+
+    - If axis_name also leads the output (e.g. 't h w -> t (h w)'), each rearranged chunk is yielded
+      as soon as it is ready.
+    - Otherwise the streamed axis moves, and the chunks are written into one preallocated output,
+      which is yielded once all chunks were consumed. Its total extent must be passed as a size,
+      e.g. rearrange_stream(chunks, 't h w -> h w t', t=1000).
+
+    Args:
+        chunks (iterable): arrays sharing all but their leading dimension.
+        pattern (str): einops-like pattern.
+        axis_name (str): name of the streamed axis.
+        max_chunks (int): number of chunks concatenated and rearranged together; at most this many
+            input chunks are held in memory at once.
+        out (np.ndarray, optional): preallocated output for the accumulating mode, in any memory
+            layout. Required if chunks may be empty, since the output is otherwise allocated from the
+            first chunk.
+        kwargs: axis sizes, as accepted by rearrange(). `axis_name`, `max_chunks` and `out` are
+            reserved and cannot be used as axis names.
+
+    Returns:
+        generator: yields rearranged chunks, or the complete output in the accumulating mode.
+
+    Raises:
+        ValueError: If the pattern is invalid, axis_name does not lead the input, or the total extent
+            of a moving axis is missing or does not match the chunks, or chunks is empty and out
+            is not given.
+    """
+    if max_chunks < 1:
+        raise ValueError(f"max_chunks must be at least 1, got {max_chunks}.")
+
+    total = kwargs.pop(axis_name, None)
+    rearrangement = compile_pattern(pattern, **kwargs)
+
+    parsed = parse_pattern(pattern)
+    if _leading_axis(parsed.input) != axis_name:
+        raise ValueError(f"Streamed axis '{axis_name}' must be the outermost axis of the input pattern '{parsed.input.text}'.")
+
+    # Every chunk's leading dimension is its extent of axis_name times the rest of its group
+    leading = parsed.input.terms[0]
+    group = leading.axes[1:]
+    missing = [dim for dim in group if dim not in kwargs]
+    if missing:
+        raise ValueError(f"Sizes of {missing} must be given to stream over '{leading.token}'.")
+    factor = prod(kwargs[dim] for dim in group)
+
+    batches = _batched(chunks, max_chunks)
+    if _leading_axis(parsed.output) == axis_name:
+        return (rearrangement(batch) for batch in batches)
+
+    if total is None:
+        raise ValueError(f"Axis '{axis_name}' moves in '{pattern}', so its total extent must be given "
+                         f"(e.g. {axis_name}=...) to preallocate the output.")
+    return _accumulate(batches, pattern, total, factor, out, kwargs)
+
+def _batched(chunks, max_chunks):
+    """
+    Groups consecutive chunks into batches of up to max_chunks, concatenated along the leading axis.
+    """
+    if max_chunks == 1:
+        yield from chunks
+        return
+    pending = []
+    for chunk in chunks:
+        pending.append(chunk)
+        if len(pending) == max_chunks:
+            yield np.concatenate(pending)
+            pending = []
+    if pending:
+        yield np.concatenate(pending)
+
+def _accumulate(batches, pattern, total, factor, out, kwargs):
+    """
+    Writes every batch into its slab of the output, viewed with its elementary (ungrouped) axes.
+    """
+    target = None
+    offset = 0
+    for batch in batches:
+        batch = to_numpy_array(batch)
+        if batch.shape[0] % factor:
+            raise ValueError(f"Chunk with leading dimension {batch.shape[0]} is not a multiple of {factor}.")
+        if target is None:
+            full = _get_recipe((total * factor,) + batch.shape[1:], pattern, kwargs)
+            if out is None:
+                out = np.empty(full.final_shape, dtype=batch.dtype)
+            elif out.shape != full.final_shape:
+                raise ValueError(f"Output buffer has shape {out.shape}, expected {full.final_shape}.")
+            # Splitting the output axes into the transposed ones is a view for any strides. The streamed
+            # axis is the first elementary input axis; find where the transpose puts it
+            target = out.reshape([full.init_shape[axis] for axis in full.axes])
+            stream_axis = full.axes.index(0)
+            index = [slice(None)] * target.ndim
+
+        extent = batch.shape[0] // factor
+        if offset + extent > total:
+            raise ValueError(f"Chunks contain more than {total} steps along the streamed axis.")
+        recipe = _get_recipe(batch.shape, pattern, kwargs)
+        index[stream_axis] = slice(offset, offset + extent)
+        np.copyto(target[tuple(index)], batch.reshape(recipe.init_shape).transpose(recipe.axes))
+        offset += extent
+
+    if offset != total:
+        raise ValueError(f"Chunks contain {offset} steps along the streamed axis, expected {total}.")
+    if out is None:
+        raise ValueError("No chunks were given, so the shape and dtype of the output are unknown; "
+                         "pass out= to stream an empty iterable.")
+    yield out
@@ -1,4 +1,10 @@
 from math import prod
+import numpy as np
+from collections import namedtuple
+from .parsing import token_axes
+
+# compact is an equivalent recipe with fewer transposed axes (built from Plan.runs), or None
+Recipe = namedtuple('Recipe', ['init_shape', 'axes', 'final_shape', 'compact'], defaults=(None,))
 
 def input_based_transformation(array, input_mapping, input_shape_mapping, **kwargs):
     """
@@ -127,7 +133,7 @@ class Output_Transformations:
             self.array = self.array.squeeze(axis=tuple(remove_arr))
 
     def stripped_order(self, d):
-        return " ".join(d).replace("(", "").replace(")", "").split(" ")
+        return token_axes(d)
 
     def add_singleton(self):
         """
@@ -221,4 +227,95 @@ class Output_Transformations:
             self.resum_array()   # Step 4: Reshape grouped dimensions
             return self.resummed_array
         else:
-            return self.reshaped_array
\ No newline at end of file
+            return self.reshaped_array
+
+def _select_recipe(array, recipe, backend=None):
+    """
+    Returns the compact variant of recipe when merging axes of array is free (contiguous input).
+    """
+    if recipe.compact is None:
+        return recipe
+    if backend is None:
+        return recipe.compact if array.flags.c_contiguous else recipe
+    return recipe.compact if backend.can_merge_axes(array) else recipe
+
+def apply_recipe(array, recipe, backend=None):
+    """
+    Applies a recipe built by Plan.recipe to an array.
+
+    Parameters:
+    - array: array to transform, native to backend.
+    - recipe: Recipe, as returned by Plan.recipe.
+    - backend: object providing reshape/transpose (see backends.py). NumPy methods are used if omitted.
+    """
+    recipe = _select_recipe(array, recipe, backend)
+    if backend is None:
+        return array.reshape(recipe.init_shape).transpose(recipe.axes).reshape(recipe.final_shape)
+    array = backend.reshape(array, recipe.init_shape)
+    array = backend.transpose(array, recipe.axes)
+    return backend.reshape(array, recipe.final_shape)
+
+def reshape_is_view(shape, strides, new_shape):
+    """
+    Checks whether an array with the given shape and strides can be reshaped to new_shape without a copy.
+
+    Mirrors NumPy's own no-copy reshape test (C order): dimensions are matched in blocks of equal
+    size, and every block of old dimensions that gets merged must be laid out contiguously.
+
+    Parameters:
+    - shape: tuple, current shape.
+    - strides: tuple, current strides (any unit, e.g. bytes).
+    - new_shape: tuple, requested shape with the same number of elements.
+
+    Returns:
+    - bool: True if the reshape can return a view.
+    """
+    if prod(shape) == 0:
+        return True
+
+    old = [(n, st) for n, st in zip(shape, strides) if n != 1]
+    new = [n for n in new_shape if n != 1]
+
+    oi = ni = 0
+    while oi < len(old) and ni < len(new):
+        oj, nj = oi + 1, ni + 1
+        old_size, new_size = old[oi][0], new[ni]
+        while old_size != new_size:
+            if new_size < old_size:
+                new_size *= new[nj]
+                nj += 1
+            else:
+                old_size *= old[oj][0]
+                oj += 1
+        for k in range(oi, oj - 1):
+            if old[k][1] != old[k + 1][0] * old[k + 1][1]:
+                return False
+        oi, ni = oj, nj
+    return True
+
+def write_recipe(array, recipe, out, copyto=np.copyto):
+    """
+    Applies a recipe to a NumPy array and writes the result into out in a single copy.
+
+    out is viewed with the transposed (pre-grouping) shape, so the transposed input is copied
+    straight into it without materializing the result first. Going from the final shape to the
+    transposed one only splits axes, which is a view for any strides; the compact recipe may also
+    merge axes, so it is only used for C-contiguous buffers.
+
+    Parameters:
+    - array: np.ndarray, array to transform.
+    - recipe: Recipe, as returned by Plan.recipe.
+    - out: np.ndarray, destination with shape recipe.final_shape.
+    - copyto: function copying its second argument into the first (see engines.py).
+
+    Returns:
+    - np.ndarray: out.
+    """
+    if out.shape != recipe.final_shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {recipe.final_shape}.")
+
+    if out.flags.c_contiguous:
+        recipe = _select_recipe(array, recipe)
+    source = array.reshape(recipe.init_shape).transpose(recipe.axes)
+    copyto(out.reshape(source.shape), source)
+    return out
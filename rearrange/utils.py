@@ -1,97 +1,62 @@
 import re
+import sys
 import numpy as np
 # from math import prod
 # import json
-import torch
 
-def _tokenize(pattern_str):
+def _is_torch_tensor(input_data):
     """
-    Tokenize a pattern string into a list of items:
-    - '...' (ellipsis)
-    - '(...)' (group)
-    - '\w+' (single axis, e.g. 'b', 'h', 'h1')
+    Checks whether input_data is a torch.Tensor without importing torch.
     """
+    torch = sys.modules.get('torch')
+    return torch is not None and isinstance(input_data, torch.Tensor)
 
-    tokens = re.findall(r'\.\.\.|\([\w\s\-]+\)|-?\w+', pattern_str)
-    return tokens
+# Buffer formats holding raw bytes rather than typed elements; a dtype hint reinterprets them
+_BYTE_FORMATS = ('B', 'b', 'c')
 
-def to_numpy_array(input_data):
+def to_numpy_array(input_data, dtype=None):
     """
-    Converts the input data to a NumPy array.
+    Converts the input data to a NumPy array, without copying whenever the input already holds
+    its elements in memory.
     Supports:
-        - list
         - NumPy array (returned as-is)
+        - list (converted with np.array, to dtype if given instead of guessing it)
         - PyTorch tensor (converted to NumPy array)
+        - objects exposing __array_interface__ or __dlpack__ (wrapped without copying)
+        - objects supporting the buffer protocol, e.g. memoryview, bytearray, array.array or
+          PyArrow buffers (wrapped without copying, keeping their format and shape)
+    dtype: a hint applied where it is free:
+        - element type of list inputs.
+        - for raw byte buffers (bytearray, shared memory), the type the bytes are viewed as,
+          without copying.
+        - ignored for typed inputs, which keep their dtype; rearrange() casts them while
+          materializing its result instead of converting them up front.
     Raises:
         - TypeError if input data is of an unsupported type.
-    """
-    if isinstance(input_data, np.ndarray):
-        return input_data
-    elif isinstance(input_data, list):
-        return np.array(input_data)
-    elif isinstance(input_data, torch.Tensor):
-        return input_data.numpy()
-    else:
-        raise TypeError(f"Unsupported input type: {type(input_data)}. Expected list, NumPy array, or PyTorch tensor.")
-
-def clean_singletons_in_parentheses(pattern):
-    """
-    Cleans up singletons in parentheses in einops rearrange patterns.
-
-    Parameters:
-        pattern (str): The rearrange pattern to clean.
-
-    Returns:
-        str: The cleaned pattern.
-
-    For example,
-    Input: b (c 1 1) h w -> b c h w
-    Output:  b c h w -> b c h w
-    """
-
-    # Define a regex to match parentheses containing dimensions
-    paren_regex = re.compile(r'\(([^()]+)\)')
-
-    def replace_function(match):
-        # Extract inside of parentheses
-        content = match.group(1)
-        # Remove `1` from the dimensions
-        cleaned_content = ' '.join([dim for dim in content.split() if dim != '1'])
-        # If only one dimension remains, remove parentheses
-        return cleaned_content if ' ' not in cleaned_content else f'({cleaned_content})'
-
-    # Replace all parentheses content using the defined function
-    cleaned_pattern = paren_regex.sub(replace_function, pattern)
 
-    # Remove redundant spaces and ensure clean formatting
-    cleaned_pattern = re.sub(r'\s+', ' ', cleaned_pattern).strip()
-
-    return cleaned_pattern
-
-def unexpected_chars_checker(s):
-    """
-    Check for unexpected characters in the pattern.
-
-    Returns:
-        bool: True if no unexpected characters are found, raises a ValueError otherwise.
-
-    Raises:
-        ValueError: If unexpected characters are found in the pattern.
+    torch is never imported here: a tensor can only exist if torch is already in sys.modules.
     """
+    if isinstance(input_data, list):
+        return np.array(input_data, dtype=dtype)
 
-    # Define the valid pattern for allowed tokens
-    valid_pattern = re.compile(r'^([a-zA-Z]+[1-9][0-9]*|[a-zA-Z]+|\.\.\.|1)$')  # Matches h1, h11, a, b, ..., or 1
-
-    # Remove '->' and parentheses for simpler parsing
-    tokens = s.replace('->', '').translate(str.maketrans('', '', '()')).split()
-
-    # Check each token against the valid pattern
-    unexpected_chars = [token for token in tokens if not valid_pattern.match(token)]
-
-    if unexpected_chars:
-        raise ValueError(f"Unexpected characters found in pattern: {unexpected_chars}")
-
-    # return True  # No unexpected characters found
+    if isinstance(input_data, np.ndarray):
+        array = input_data
+    elif _is_torch_tensor(input_data):
+        array = input_data.numpy()
+    elif hasattr(input_data, '__array_interface__'):
+        array = np.asarray(input_data)
+    elif hasattr(input_data, '__dlpack__'):
+        array = np.from_dlpack(input_data)
+    else:
+        try:
+            view = memoryview(input_data)
+        except TypeError:
+            raise TypeError(f"Unsupported input type: {type(input_data)}. Expected list, NumPy array, PyTorch tensor, "
+                            f"or an object exposing __array_interface__, __dlpack__ or the buffer protocol.") from None
+        if dtype is not None and view.format in _BYTE_FORMATS and view.contiguous:
+            return np.frombuffer(view, dtype=dtype)
+        return np.asarray(view)
+    return array
 
 def tokens_from_paranthesis(input_set):
     """
@@ -1,63 +1,60 @@
-from .utils import to_numpy_array, unexpected_chars_checker, clean_singletons_in_parentheses, _tokenize
+from .utils import to_numpy_array
+from .parsing import parse_pattern, PatternError
 
 class Validator:
     def __init__(self, array, pattern, **kwargs):
         self.array = to_numpy_array(array)
         self._is_empty_array = self.array.size == 0
-        unexpected_chars_checker(pattern)
-        self.pattern = clean_singletons_in_parentheses(pattern)
-        self.kwargs = kwargs
-        self.array_shape = self.array.shape
-
-        self.input_str, self.output_str = self._parse_pattern()
-        self.input_tokens = _tokenize(self.input_str)
-        self.output_tokens = _tokenize(self.output_str)
-    
-    def _parse_pattern(self):
-        """
-        Parses the pattern and splits it into input and output strings.
+        self._setup(self.array.shape, pattern, **kwargs)
 
-        Returns:
-            tuple: A tuple containing the input and output strings.
+    @classmethod
+    def from_shape(cls, shape, pattern, **kwargs):
         """
-        try:
-            input_str, output_str = self.pattern.split("->")
-            return input_str.strip(), output_str.strip()
-        except ValueError:
-            raise ValueError(f"Invalid pattern: {self.pattern} /n Expected format: input_shape -> output_shape")
-    
-    def stripped_order(self, d):
+        Builds a validator from an array shape alone. Validation only ever looks at the shape,
+        so this avoids converting (or even having) the array.
         """
-        removes all parantheses from a list and returns a list
+        v = cls.__new__(cls)
+        v.array = None
+        v._is_empty_array = 0 in shape
+        v._setup(tuple(shape), pattern, **kwargs)
+        return v
+
+    def _setup(self, array_shape, pattern, **kwargs):
+        self.parsed = parse_pattern(pattern)
+        self.kwargs = kwargs
+        self.array_shape = array_shape
+
+        self.input_tokens = list(self.parsed.input.tokens)
+        self.output_tokens = list(self.parsed.output.tokens)
+        self.input_str = self.parsed.input.text
+        self.output_str = self.parsed.output.text
+        self.pattern = f"{self.input_str} -> {self.output_str}"
 
-        ["a", "(b c)"] -> ["a", "b", "c"]
-        """
-        
-        return " ".join(d).replace("(", "").replace(")", "").split()
-    
     def identified_match_checker(self):
         """
         checks for discrepancies betweem identifiers in the input and output pattern.
-        Raises value error if there are differences in identifiers or if some identifiers are duplicated
+        Raises value error if there are differences in identifiers (duplicates are rejected by the parser)
         """
         
-        input_tokens_stripped = [item for item in self.stripped_order(self.input_tokens) if item != '1']
-        output_tokens_stripped = [item for item in self.stripped_order(self.output_tokens) if item != '1']
+        input_axes = self.parsed.input.axes
+        output_axes = self.parsed.output.axes
 
-        if(len(set(input_tokens_stripped))!=len(input_tokens_stripped)):
-            raise ValueError(f"Input pattern {self.input_str} contains duplicate dimension")
-        if(len(set(output_tokens_stripped))!=len(output_tokens_stripped)):
-            raise ValueError(f"Input pattern {self.output_str} contains duplicate dimension")
+        if self.parsed.input.has_ellipsis != self.parsed.output.has_ellipsis:
+            side = self.parsed.input if self.parsed.input.has_ellipsis else self.parsed.output
+            position = next(term.position for term in side.terms if term.token == '...')
+            raise PatternError("Identifiers only on one side of expression (should be on both): {'...'}",
+                               self.parsed.pattern, position)
 
-        missing_in_output = set(input_tokens_stripped)-set(output_tokens_stripped)
-        extra_in_output = set(output_tokens_stripped)-set(input_tokens_stripped)
+        missing_in_output = [axis for axis in input_axes if axis not in output_axes]
+        extra_in_output = [axis for axis in output_axes if axis not in input_axes]
 
         if missing_in_output:
-            raise ValueError(f"Identifiers only on one side of expression (should be on both): {missing_in_output}")
+            raise PatternError(f"Identifiers only on one side of expression (should be on both): {set(missing_in_output)}",
+                               self.parsed.pattern, self.parsed.input.position_of(missing_in_output[0]))
         if extra_in_output:
-            raise ValueError(f"Identifiers only on one side of expression (should be on both): {extra_in_output}")
-        
-    
+            raise PatternError(f"Identifiers only on one side of expression (should be on both): {set(extra_in_output)}",
+                               self.parsed.pattern, self.parsed.output.position_of(extra_in_output[0]))
+
     def ellipsis_checker(self):
         """
         checks for the presence of ellipsis in the input and output pattern.
@@ -95,7 +92,7 @@ class Validator:
         if ellipsis_count > 1:
             raise ValueError("Pattern can have at most one ellipsis ('...').")
         
-        if ellipsis_count == 0 and len(self.input_tokens) != len(self.array.shape):
+        if ellipsis_count == 0 and len(self.input_tokens) != len(self.array_shape):
             raise ValueError(f"Number of input tokens ({len(self.input_tokens)}) must match the array dimensions ({len(self.array_shape)}) unless using ellipsis ('...').")
         
         if ellipsis_count == 1 and len(non_ellipsis_tokens) > len(self.array_shape):
@@ -125,16 +122,16 @@ class Validator:
 
         for tok, ind in zip(non_ellipsis_tokens, array_shape_indices):
             if tok == '1':
-                if self.array.shape[ind] != 1:
+                if self.array_shape[ind] != 1:
                     raise ValueError(
-                        f"Dimension for token '1' must be 1, but got {self.array.shape[ind]} at index {ind}."
+                        f"Dimension for token '1' must be 1, but got {self.array_shape[ind]} at index {ind}."
                     )
                 singleton_count += 1
                 input_tokens_mapping["singleton_"+str(singleton_count)] = ind
-                input_tokens_shape_mapping["singleton_"+str(singleton_count)] = self.array.shape[ind]
+                input_tokens_shape_mapping["singleton_"+str(singleton_count)] = self.array_shape[ind]
             else:
                 input_tokens_mapping[tok] = ind
-                input_tokens_shape_mapping[tok] = self.array.shape[ind]
+                input_tokens_shape_mapping[tok] = self.array_shape[ind]
         
         self.input_tokens_mapping = input_tokens_mapping
         self.input_tokens_shape_mapping = input_tokens_shape_mapping
@@ -152,10 +149,6 @@ class Validator:
             'c': 2
             }
         """
-        _, output_str =self.pattern.split("->")
-        self.output_str = output_str.strip()
-        self.output_tokens = _tokenize(output_str)
-
         output_tokens_mapping = {}
 
         current_index = 0
@@ -182,9 +175,11 @@ class Validator:
         if('...') in list(self.input_tokens_mapping.keys()) and len(self.input_tokens_mapping['...']) == 0:
             del self.input_tokens_mapping['...']
             del self.input_tokens_shape_mapping['...']
-            new_pattern = self.pattern.replace('...', '')
-
-            self.pattern = new_pattern.lstrip().rstrip()
+            self.input_tokens = [token for token in self.input_tokens if token != '...']
+            self.output_tokens = [token for token in self.output_tokens if token != '...']
+            self.input_str = ' '.join(self.input_tokens)
+            self.output_str = ' '.join(self.output_tokens)
+            self.pattern = f"{self.input_str} -> {self.output_str}"
 
     def validate_and_return(self):
         """
@@ -6,9 +6,11 @@ setup(
     packages=find_packages(),
     install_requires=[
         "numpy",
-        "torch",  # Optional
         "einops",  # For time comparison
     ],
+    extras_require={
+        "torch": ["torch"],
+    },
     author="Your Name",
     author_email="your.email@example.com",
     description="A flexible array rearrangement library inspired by einops",
@@ -2,14 +2,36 @@ import unittest
 import numpy as np
 import sys
 import os
+import subprocess
+import tempfile
+import json
+import pickle
+import asyncio
+import threading
+import queue
+import tracemalloc
+from unittest import mock
+import array as pyarray
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the parent directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Now import your modules
 from rearrange.validators import Validator
-from rearrange.rearrange import rearrange
-from rearrange.transformations import Output_Transformations
+from rearrange.rearrange import rearrange, rearrange_many, will_copy, reduce, repeat
+from rearrange.transformations import Output_Transformations, reshape_is_view
+from rearrange.compiled import Rearrangement, compile_pattern
+from rearrange.backends import Backend, register_backend, unregister_backend, get_backend
+from rearrange import engines
+from rearrange.engines import tiled_copyto, parallel_copyto, set_num_workers, get_num_workers
+from rearrange.streaming import rearrange_to_file, rearrange_stream
+from rearrange.asynchronous import arearrange, set_executor
+from rearrange.packing import pack, unpack
+from rearrange.profiling import profile, stats
+from rearrange.plans import build_plan, save_plans, load_plans
+from rearrange.parsing import parse_pattern, parse_pack_pattern, PatternError, AXIS, GROUP, ELLIPSIS, SINGLETON
+from rearrange.cache import RecipeCache, cache_info, clear_cache, set_cache_size
 
 class TestValidator(unittest.TestCase):
     def test_valid_pattern(self):
@@ -171,4 +193,1054 @@ class TestRearrangeFunctions(unittest.TestCase):
         with self.assertRaises(ValueError):
             rearrange(array, pattern, **args)
 
+class TestRecipeCache(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def tearDown(self):
+        set_cache_size(1024)
+        clear_cache()
+
+    def test_hits_and_misses(self):
+        array = np.random.randn(2, 12, 18, 6)
+        pattern = 'b (h h1) (w w1) c -> b h w (c h1 w1)'
+        first = rearrange(array, pattern, h1=3, w=6)
+        second = rearrange(array, pattern, h1=3, w=6)
+        np.testing.assert_array_equal(first, second)
+        info = cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+        # Plans do not depend on sizes: another batch size reuses the plan, while different kwargs
+        # or a different number of dimensions compile a new one
+        rearrange(np.random.randn(4, 24, 18, 6), pattern, h1=3, w=6)
+        self.assertEqual(cache_info().misses, 1)
+        rearrange(array, pattern, h1=4, w=6)
+        rearrange(np.random.randn(2, 3), 'a b -> b a')
+        rearrange(np.random.randn(2, 3, 4), '... b -> b ...')
+        rearrange(np.random.randn(2, 3, 4, 5), '... b -> b ...')
+        self.assertEqual(cache_info().misses, 5)
+
+    def test_errors_are_not_cached(self):
+        array = np.random.randn(32, 30, 120)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                rearrange(array, 'b h (w1 w2) -> w1 h b', w1=12)
+        self.assertEqual(cache_info().currsize, 0)
+
+        # Shapes that do not fit a valid plan fail on every call, and the plan stays cached
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                rearrange(array, 'b h (w1 w2) -> w1 h b w2', w1=11)
+        self.assertEqual(cache_info().currsize, 1)
+
+    def test_lru_eviction(self):
+        cache = RecipeCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        with self.assertRaises(ValueError):
+            cache.resize(-1)
+
+    def test_disabled_cache(self):
+        set_cache_size(0)
+        array = np.random.randn(2, 3)
+        rearrange(array, 'a b -> b a')
+        rearrange(array, 'a b -> b a')
+        self.assertEqual(cache_info().currsize, 0)
+        self.assertEqual(cache_info().hits, 0)
+
+class TestCompilePattern(unittest.TestCase):
+    def test_matches_rearrange(self):
+        images = np.random.randn(2, 32, 48, 3)
+        pattern = 'b (h p1) (w p2) c -> b (h w) (p1 p2 c)'
+        patchify = compile_pattern(pattern, p1=16, p2=16)
+        self.assertIsInstance(patchify, Rearrangement)
+        result = patchify(images)
+        self.assertEqual(result.shape, (2, 6, 768))
+        np.testing.assert_array_equal(result, rearrange(images, pattern, p1=16, p2=16))
+
+    def test_precomputed_recipe(self):
+        patchify = compile_pattern('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', p1=16, p2=16)
+        recipe = patchify.recipe((2, 32, 48, 3))
+        self.assertEqual(recipe.init_shape, (2, 2, 16, 3, 16, 3))
+        self.assertEqual(recipe.axes, (0, 1, 3, 2, 4, 5))
+        self.assertEqual(recipe.final_shape, (2, 6, 768))
+        self.assertIs(patchify.recipe((2, 32, 48, 3)), recipe)
+
+    def test_pattern_errors_at_compile_time(self):
+        for pattern, kwargs in [('a b c -> a c', {}), ('a b -> a b', {'c': 2}), ('a $ -> a', {})]:
+            with self.assertRaises(ValueError):
+                compile_pattern(pattern, **kwargs)
+
+    def test_shape_errors_at_call_time(self):
+        split = compile_pattern('(h w) c -> h w c', h=5)
+        with self.assertRaises(ValueError):
+            split(np.ones((12, 2)))
+
+class TestTorchOptional(unittest.TestCase):
+    def test_import_does_not_load_torch(self):
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        code = "import sys, rearrange; print('torch' in sys.modules, 'asyncio' in sys.modules)"
+        out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        # asyncio is only imported by arearrange(), as it would double the cost of importing the package
+        self.assertEqual(out.stdout.split(), ['False', 'False'])
+
+    def test_torch_tensor_input(self):
+        try:
+            import torch
+        except ImportError:
+            self.skipTest("torch is not installed")
+        result = rearrange(torch.arange(6).reshape(2, 3), 'a b -> b a')
+        self.assertIsInstance(result, torch.Tensor)
+        np.testing.assert_array_equal(result.numpy(), np.arange(6).reshape(2, 3).T)
+
+    def test_torch_native_views_and_autograd(self):
+        try:
+            import torch
+        except ImportError:
+            self.skipTest("torch is not installed")
+        x = torch.randn(2, 12, 18, 6, requires_grad=True)
+        pattern = 'b (h h1) (w w1) c -> b h w (c h1 w1)'
+        result = rearrange(x, pattern, h1=3, w=6)
+        expected = rearrange(x.detach().numpy(), pattern, h1=3, w=6)
+        np.testing.assert_array_equal(result.detach().numpy(), expected)
+        result.sum().backward()
+        self.assertTrue(torch.equal(x.grad, torch.ones_like(x)))
+
+        # Pure splits and permutations stay views of the input
+        y = torch.randn(4, 6)
+        view = compile_pattern('a (b c) -> c a b', c=3)(y)
+        self.assertEqual(view.data_ptr(), y.data_ptr())
+
+class _LazyArray:
+    """
+    Minimal Array API-style array that records operations instead of executing them.
+    """
+
+    def __init__(self, data, ops=()):
+        self.data = data
+        self.ops = ops
+        self.shape = data.shape
+
+    def __array_namespace__(self):
+        return _LazyNamespace
+
+class _LazyNamespace:
+    @staticmethod
+    def reshape(x, shape):
+        return _LazyArray(x.data.reshape(shape), x.ops + ('reshape',))
+
+    @staticmethod
+    def permute_dims(x, axes):
+        return _LazyArray(x.data.transpose(axes), x.ops + ('permute_dims',))
+
+class TestBackends(unittest.TestCase):
+    def test_array_api_dispatch(self):
+        data = np.random.randn(2, 12, 6)
+        result = rearrange(_LazyArray(data), 'b (h w) c -> b c h w', w=3)
+        self.assertIsInstance(result, _LazyArray)
+        self.assertEqual(result.ops, ('reshape', 'permute_dims', 'reshape'))
+        np.testing.assert_array_equal(result.data, rearrange(data, 'b (h w) c -> b c h w', w=3))
+
+    def test_custom_backend(self):
+        class Boxed:
+            def __init__(self, data):
+                self.data = data
+                self.shape = data.shape
+
+        class BoxedBackend(Backend):
+            name = 'boxed'
+
+            def is_appropriate(self, x):
+                return isinstance(x, Boxed)
+
+            def reshape(self, x, shape):
+                return Boxed(x.data.reshape(shape))
+
+            def transpose(self, x, axes):
+                return Boxed(x.data.transpose(axes))
+
+        backend = BoxedBackend()
+        register_backend(backend)
+        try:
+            self.assertIs(get_backend(Boxed(np.ones(2))), backend)
+            result = rearrange(Boxed(np.arange(6).reshape(2, 3)), 'a b -> b a')
+            self.assertIsInstance(result, Boxed)
+            np.testing.assert_array_equal(result.data, np.arange(6).reshape(2, 3).T)
+        finally:
+            unregister_backend(backend)
+        with self.assertRaises(TypeError):
+            rearrange(Boxed(np.ones(2)), 'a -> a')
+        with self.assertRaises(TypeError):
+            register_backend(object())
+
+class TestRearrangeMany(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def test_list_of_results(self):
+        arrays = [np.random.randn(2, 12, 6) for _ in range(5)]
+        pattern = 'b (h w) c -> b c h w'
+        results = rearrange_many(arrays, pattern, w=3)
+        self.assertEqual(len(results), 5)
+        for array, result in zip(arrays, results):
+            np.testing.assert_array_equal(result, rearrange(array, pattern, w=3))
+        # One compilation shared by all arrays (the check loop above only hits the cache)
+        self.assertEqual(cache_info().misses, 1)
+
+    def test_stacked_output(self):
+        arrays = [np.random.randn(3, 4, 5) for _ in range(4)]
+        pattern = 'a b c -> c (a b)'
+        stacked = rearrange_many(arrays, pattern, stack=True)
+        self.assertEqual(stacked.shape, (4, 5, 12))
+        np.testing.assert_array_equal(stacked, np.stack([rearrange(a, pattern) for a in arrays]))
+
+        out = np.zeros((4, 5, 12))
+        self.assertIs(rearrange_many(arrays, pattern, out=out), out)
+        np.testing.assert_array_equal(out, stacked)
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(ValueError):
+            rearrange_many([np.ones((2, 3)), np.ones((3, 2))], 'a b -> b a')
+        with self.assertRaises(ValueError):
+            rearrange_many([np.ones((2, 3))], 'a b -> b a', out=np.empty((1, 2, 3)))
+        self.assertEqual(rearrange_many([], 'a b -> b a'), [])
+
+class TestMemoryLayout(unittest.TestCase):
+    def test_out_buffer(self):
+        array = np.random.randn(2, 12, 18, 6)
+        pattern = 'b (h h1) (w w1) c -> b h w (c h1 w1)'
+        expected = rearrange(array, pattern, h1=3, w=6)
+        out = np.empty(expected.shape)
+        self.assertIs(rearrange(array, pattern, out=out, h1=3, w=6), out)
+        np.testing.assert_array_equal(out, expected)
+
+        fortran_out = np.empty(expected.shape, order='F')
+        rearrange(array, pattern, out=fortran_out, h1=3, w=6)
+        np.testing.assert_array_equal(fortran_out, expected)
+
+        with self.assertRaises(ValueError):
+            rearrange(array, pattern, out=np.empty((2, 3)), h1=3, w=6)
+
+    def test_order(self):
+        array = np.random.randn(3, 4, 5)
+        view = rearrange(array, 'a b c -> c b a')
+        self.assertTrue(np.shares_memory(view, array))
+
+        c_result = rearrange(array, 'a b c -> c b a', order='C')
+        self.assertTrue(c_result.flags.c_contiguous)
+        np.testing.assert_array_equal(c_result, view)
+
+        # A transposed view is already Fortran-contiguous, so no copy is made
+        f_result = rearrange(array, 'a b c -> c b a', order='F')
+        self.assertTrue(np.shares_memory(f_result, array))
+
+        f_result = rearrange(array, 'a b c -> b (a c)', order='F')
+        self.assertTrue(f_result.flags.f_contiguous)
+        np.testing.assert_array_equal(f_result, rearrange(array, 'a b c -> b (a c)'))
+
+        with self.assertRaises(ValueError):
+            rearrange(array, 'a b c -> c b a', order='X')
+
+    def test_non_contiguous_out_is_written_in_place(self):
+        array = np.random.randn(64, 128, 96)
+        pattern = 'a b c -> b (c a)'
+        expected = rearrange(array, pattern)
+        buffers = [np.empty(expected.shape, order='F'), np.empty((expected.shape[0], 2 * expected.shape[1]))[:, ::2]]
+        for out in buffers:
+            tracemalloc.start()
+            rearrange(array, pattern, out=out)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.assertLess(peak, array.nbytes // 100)
+            np.testing.assert_array_equal(out, expected)
+
+        tracemalloc.start()
+        rearrange(array, pattern, order='F')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(peak, 1.1 * array.nbytes)
+
+    def test_compiled_out(self):
+        transpose = compile_pattern('a b -> b a')
+        out = np.empty((3, 2))
+        transpose(np.arange(6).reshape(2, 3), out=out)
+        np.testing.assert_array_equal(out, np.arange(6).reshape(2, 3).T)
+
+class TestCopyPolicy(unittest.TestCase):
+    def test_will_copy(self):
+        self.assertFalse(will_copy('a b c -> c b a', (2, 3, 4)))
+        self.assertFalse(will_copy('b (h w) c -> b h w c', (2, 12, 3), w=4))
+        self.assertFalse(will_copy('b h w c -> b (h w) c', (2, 3, 4, 5)))
+        self.assertTrue(will_copy('b h w c -> b (w h) c', (2, 3, 4, 5)))
+        self.assertFalse(will_copy('b h w c -> b c (h w)', (2, 3, 4, 5)))
+        self.assertTrue(will_copy('b h w c -> b (c h) w', (2, 3, 4, 5)))
+
+    def test_copy_false(self):
+        array = np.random.randn(2, 3, 4, 5)
+        view = rearrange(array, 'b h w c -> b (h w) c', copy=False)
+        self.assertTrue(np.shares_memory(view, array))
+        with self.assertRaises(ValueError):
+            rearrange(array, 'b h w c -> b (c h) w', copy=False)
+        with self.assertRaises(ValueError):
+            rearrange(array, 'b h w c -> b w h c', copy=False, order='C')
+        with self.assertRaises(ValueError):
+            rearrange(array, 'b h w c -> b h w c', copy=False, out=np.empty_like(array))
+
+    def test_copy_true(self):
+        array = np.random.randn(2, 3, 4)
+        result = rearrange(array, 'a b c -> a b c', copy=True)
+        self.assertFalse(np.shares_memory(result, array))
+        np.testing.assert_array_equal(result, array)
+
+    def test_reshape_is_view_matches_numpy(self):
+        array = np.empty((4, 6, 5)).transpose(1, 0, 2)
+        for new_shape in [(6, 20), (24, 5), (2, 3, 4, 5), (6, 4, 5, 1), (120,)]:
+            try:
+                array.reshape(new_shape).base
+                expected = np.shares_memory(array.reshape(new_shape), array)
+            except ValueError:
+                expected = False
+            self.assertEqual(reshape_is_view(array.shape, array.strides, new_shape), expected, new_shape)
+
+class TestCompactRecipe(unittest.TestCase):
+    def test_merges_axes_travelling_together(self):
+        plan = build_plan('b h w c -> b c (h w)', 4)
+        self.assertEqual(plan.runs, ((0,), (1, 2), (3,)))
+        compact = plan.recipe((2, 3, 4, 5)).compact
+        self.assertEqual(compact.init_shape, (2, 12, 5))
+        self.assertEqual(compact.axes, (0, 2, 1))
+        self.assertEqual(compact.final_shape, (2, 5, 12))
+
+    def test_drops_singletons(self):
+        compact = build_plan('a b c d -> c d a b', 4).recipe((2, 1, 3, 1)).compact
+        self.assertEqual(compact.init_shape, (2, 3))
+        self.assertEqual(compact.axes, (1, 0))
+
+        # Without the size-1 axis, a and c travel together
+        plan = build_plan('a b c -> a c b', 3)
+        self.assertIsNone(plan.runs)
+        compact = plan.recipe((2, 1, 3)).compact
+        self.assertEqual(compact.init_shape, (6,))
+        self.assertEqual(compact.axes, (0,))
+        self.assertEqual(compact.final_shape, (2, 3, 1))
+        array = np.random.randn(2, 1, 3)
+        np.testing.assert_array_equal(rearrange(array, 'a b c -> a c b'), array.transpose(0, 2, 1))
+
+    def test_identity(self):
+        compact = build_plan('a b c -> (a b c)', 3).recipe((2, 3, 4)).compact
+        self.assertEqual(compact.init_shape, (24,))
+        self.assertEqual(compact.axes, (0,))
+
+    def test_no_mergeable_axes(self):
+        plan = build_plan('h w -> w h', 2)
+        self.assertIsNone(plan.runs)
+        self.assertIsNone(plan.recipe((2, 3)).compact)
+
+    def test_non_contiguous_input_uses_full_recipe(self):
+        array = np.random.randn(5, 4, 3, 2).transpose(3, 2, 1, 0)
+        pattern = 'b h w c -> b c (h w)'
+        result = rearrange(array, pattern)
+        expected = array.transpose(0, 3, 1, 2).reshape(2, 5, 12)
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(rearrange(np.ascontiguousarray(array), pattern), expected)
+
+class TestTiledEngine(unittest.TestCase):
+    def test_matches_numpy_engine(self):
+        cases = [
+            (np.random.randn(300, 200), 'h w -> w h', {}),
+            (np.random.randn(3, 130, 70, 5).astype(np.float32), 'b h w c -> b (w c) h', {}),
+            (np.arange(200 * 150, dtype=np.uint8).reshape(200 * 150, 1), '(h w) c -> c (w h)', {'w': 150}),
+        ]
+        for array, pattern, kwargs in cases:
+            expected = rearrange(array, pattern, **kwargs)
+            result = rearrange(array, pattern, engine='tiled', copy=True, **kwargs)
+            self.assertTrue(result.flags.c_contiguous)
+            np.testing.assert_array_equal(result, expected)
+
+    def test_uneven_tiles(self):
+        src = np.random.randn(70, 45).T
+        dst = np.empty(src.shape)
+        tiled_copyto(dst, src, tile=16)
+        np.testing.assert_array_equal(dst, src)
+
+    def test_out_overlapping_input(self):
+        array = np.arange(512 * 512.).reshape(512, 512)
+        expected = array.T.copy()
+        rearrange(array, 'a b -> b a', out=array, engine='tiled')
+        np.testing.assert_array_equal(array, expected)
+
+    def test_views_are_not_copied(self):
+        array = np.random.randn(4, 5)
+        self.assertTrue(np.shares_memory(rearrange(array, 'a b -> b a', engine='tiled'), array))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            rearrange(np.ones((2, 3)), 'a b -> b a', engine='gpu')
+
+class TestParallelCopy(unittest.TestCase):
+    def setUp(self):
+        self._threshold = engines.PARALLEL_THRESHOLD
+        engines.PARALLEL_THRESHOLD = 0
+
+    def tearDown(self):
+        engines.PARALLEL_THRESHOLD = self._threshold
+        set_num_workers(1)
+
+    def test_workers_match_single_thread(self):
+        array = np.random.randn(6, 20, 30, 4)
+        pattern = 'b h w c -> b (c w) h'
+        expected = rearrange(array, pattern)
+        for engine in ('numpy', 'tiled'):
+            for workers in (2, 4, 7):
+                result = rearrange(array, pattern, engine=engine, workers=workers)
+                np.testing.assert_array_equal(result, expected)
+
+    def test_short_leading_axis(self):
+        src = np.random.randn(2, 50, 3).transpose(2, 1, 0)
+        dst = np.empty(src.shape)
+        parallel_copyto(dst, src, workers=8)
+        np.testing.assert_array_equal(dst, src)
+
+    def test_out_overlapping_input(self):
+        for engine in ('numpy', 'tiled'):
+            array = np.arange(512 * 512.).reshape(512, 512)
+            expected = array.T.copy()
+            rearrange(array, 'a b -> b a', out=array, engine=engine, workers=4)
+            np.testing.assert_array_equal(array, expected)
+
+    def test_concurrent_mixed_workers(self):
+        array = np.random.randn(8, 16, 12)
+        expected = array.transpose(2, 1, 0).reshape(12, -1)
+        errors = []
+
+        def work():
+            try:
+                for workers in range(2, 10):
+                    np.testing.assert_array_equal(rearrange(array, 'a b c -> c (b a)', workers=workers), expected)
+            except Exception as e:
+                errors.append(e)
+
+        # Growing the shared pool must not break threads still submitting to the previous one
+        engines._pool, engines._pool_size = None, 0
+        threads = [threading.Thread(target=work) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_global_setting(self):
+        set_num_workers(3)
+        self.assertEqual(get_num_workers(), 3)
+        array = np.random.randn(8, 9)
+        np.testing.assert_array_equal(rearrange(array, 'a b -> (b a)'), array.T.reshape(-1))
+        with self.assertRaises(ValueError):
+            set_num_workers(0)
+        with self.assertRaises(ValueError):
+            rearrange(array, 'a b -> b a', workers=0, copy=True)
+
+class TestRearrangeToFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, 'src.npy')
+        self.dst = os.path.join(self.tmp.name, 'dst.npy')
+        self.array = np.random.randn(12, 5, 7).astype(np.float32)
+        np.save(self.src, self.array)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_path_input_small_chunks(self):
+        pattern = '(t c) h w -> c t h w'
+        expected = rearrange(self.array, pattern, c=3)
+        for chunk_bytes in (1, 40, 1000, 2**20):
+            result = rearrange_to_file(self.src, self.dst, pattern, chunk_bytes=chunk_bytes, c=3)
+            self.assertIsInstance(result, np.memmap)
+            np.testing.assert_array_equal(result, expected)
+            del result
+        np.testing.assert_array_equal(np.load(self.dst), expected)
+
+    def test_memmap_input(self):
+        src = np.load(self.src, mmap_mode='r')
+        result = rearrange_to_file(src, self.dst, 't h w -> w (t h)', chunk_bytes=64)
+        np.testing.assert_array_equal(result, rearrange(self.array, 't h w -> w (t h)'))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(TypeError):
+            rearrange_to_file([1, 2, 3], self.dst, 'a -> a')
+        with self.assertRaises(ValueError):
+            rearrange_to_file(self.src, self.dst, 't h w -> w h t', chunk_bytes=0)
+
+class TestRearrangeStream(unittest.TestCase):
+    def setUp(self):
+        self.array = np.random.randn(20, 4, 6)
+
+    def chunks(self, size=3):
+        return (self.array[i:i + size] for i in range(0, len(self.array), size))
+
+    def test_pass_through(self):
+        pattern = 't h w -> t (w h)'
+        results = list(rearrange_stream(self.chunks(), pattern))
+        self.assertEqual(len(results), 7)
+        np.testing.assert_array_equal(np.concatenate(results), rearrange(self.array, pattern))
+
+        results = list(rearrange_stream(self.chunks(), pattern, max_chunks=3))
+        self.assertEqual(len(results), 3)
+        np.testing.assert_array_equal(np.concatenate(results), rearrange(self.array, pattern))
+
+    def test_accumulate_moving_axis(self):
+        for pattern in ('t h w -> h w t', 't h w -> (w t) h'):
+            results = list(rearrange_stream(self.chunks(), pattern, t=20))
+            self.assertEqual(len(results), 1)
+            np.testing.assert_array_equal(results[0], rearrange(self.array, pattern))
+
+        out = np.empty((4, 6, 20))
+        result, = rearrange_stream(self.chunks(), 't h w -> h w t', t=20, out=out)
+        self.assertIs(result, out)
+
+    def test_non_contiguous_out(self):
+        pattern = 't h w -> (w t) h'
+        for out in (np.empty((120, 4), order='F'), np.empty((120, 8))[:, ::2]):
+            result, = rearrange_stream(self.chunks(), pattern, t=20, out=out)
+            self.assertIs(result, out)
+            np.testing.assert_array_equal(out, rearrange(self.array, pattern))
+
+    def test_empty_iterable(self):
+        with self.assertRaises(ValueError):
+            list(rearrange_stream([], 't h -> h t', t=0))
+        out = np.empty((4, 0))
+        result, = rearrange_stream([], 't h -> h t', t=0, out=out)
+        self.assertIs(result, out)
+        with self.assertRaises(ValueError):
+            list(rearrange_stream([], 't h -> h t', t=3, out=np.empty((4, 3))))
+
+    def test_grouped_streamed_axis(self):
+        array = np.random.randn(24, 5)
+        chunks = (array[i:i + 6] for i in range(0, 24, 6))
+        result, = rearrange_stream(chunks, '(t c) w -> c t w', t=12, c=2)
+        np.testing.assert_array_equal(result, rearrange(array, '(t c) w -> c t w', c=2))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            rearrange_stream(self.chunks(), 't h w -> h w t')
+        with self.assertRaises(ValueError):
+            rearrange_stream(self.chunks(), 'h t w -> t h w')
+        with self.assertRaises(ValueError):
+            rearrange_stream(self.chunks(), '(t c) h -> c t h')
+        with self.assertRaises(ValueError):
+            list(rearrange_stream(self.chunks(), 't h w -> h w t', t=25))
+
+class TestReduce(unittest.TestCase):
+    def test_pooling_with_anonymous_axes(self):
+        array = np.random.randn(2, 3, 8, 6)
+        result = reduce(array, 'b c (h 2) (w 2) -> b c h w', 'mean')
+        expected = array.reshape(2, 3, 4, 2, 3, 2).mean(axis=(3, 5))
+        np.testing.assert_allclose(result, expected)
+
+    def test_reductions_and_regrouping(self):
+        array = np.random.randn(2, 3, 4, 5)
+        np.testing.assert_allclose(reduce(array, 'b c h w -> b', 'sum'), array.sum(axis=(1, 2, 3)))
+        np.testing.assert_allclose(reduce(array, 'b c h w -> c b', 'max'), array.max(axis=(2, 3)).T)
+        np.testing.assert_allclose(reduce(array, 'b c h w -> (w b)', 'min'), array.min(axis=(1, 2)).T.reshape(-1))
+        np.testing.assert_allclose(reduce(array, 'b c (h h2) w -> b h', 'prod', h2=2),
+                                   array.reshape(2, 3, 2, 2, 5).prod(axis=(1, 3, 4)))
+        np.testing.assert_allclose(reduce(array, '... h w -> ... h', 'mean'), array.mean(axis=3))
+
+    def test_no_reduced_axes(self):
+        array = np.random.randn(2, 3)
+        np.testing.assert_array_equal(reduce(array, 'a b -> b a', 'sum'), array.T)
+
+    def test_torch(self):
+        try:
+            import torch
+        except ImportError:
+            self.skipTest("torch is not installed")
+        x = torch.randn(2, 4, 6, generator=torch.Generator().manual_seed(0), requires_grad=True)
+        result = reduce(x, 'b (h 2) w -> b h', 'sum')
+        self.assertIsInstance(result, torch.Tensor)
+        np.testing.assert_allclose(result.detach().numpy(), x.detach().numpy().reshape(2, 2, 2, 6).sum(axis=(2, 3)),
+                                   rtol=1e-5, atol=1e-5)
+        result.sum().backward()
+
+    def test_errors(self):
+        array = np.random.randn(2, 3)
+        with self.assertRaises(ValueError):
+            reduce(array, 'a b -> a', 'median')
+        with self.assertRaises(ValueError):
+            reduce(array, 'a b -> a c', 'sum')
+        with self.assertRaises(ValueError):
+            reduce(array, 'a (b 2) -> a', 'sum')
+
+class TestRepeat(unittest.TestCase):
+    def test_new_axis_is_a_view(self):
+        mask = np.random.rand(3, 4) > 0.5
+        result = repeat(mask, 'h w -> h w c', c=3)
+        self.assertEqual(result.shape, (3, 4, 3))
+        self.assertTrue(np.shares_memory(result, mask))
+        self.assertEqual(result.strides[-1], 0)
+        for channel in range(3):
+            np.testing.assert_array_equal(result[..., channel], mask)
+
+    def test_grouping_materializes(self):
+        array = np.arange(6).reshape(2, 3)
+        np.testing.assert_array_equal(repeat(array, 'h w -> (h 2) w'), np.repeat(array, 2, axis=0))
+        np.testing.assert_array_equal(repeat(array, 'h w -> (c h) w', c=2), np.tile(array, (2, 1)))
+        np.testing.assert_array_equal(repeat(array, 'h w -> h (w c)', c=2), np.repeat(array, 2, axis=1))
+
+    def test_rearranges_existing_axes(self):
+        array = np.random.randn(6, 4)
+        result = repeat(array, '(h a) w -> w b h a', a=3, b=2)
+        self.assertEqual(result.shape, (4, 2, 2, 3))
+        np.testing.assert_array_equal(result[:, 1], rearrange(array, '(h a) w -> w h a', a=3))
+
+    def test_missing_size(self):
+        with self.assertRaises(ValueError):
+            repeat(np.ones((2, 3)), 'h w -> h w c')
+
+class TestPack(unittest.TestCase):
+    def test_round_trip(self):
+        image = np.random.randn(2, 3, 4, 5)
+        text = np.random.randn(2, 7, 5)
+        cls = np.random.randn(2, 5)
+        packed, ps = pack([image, text, cls], 'b * c')
+        self.assertEqual(packed.shape, (2, 12 + 7 + 1, 5))
+        self.assertEqual(ps, [(3, 4), (7,), ()])
+        np.testing.assert_array_equal(packed, np.concatenate([image.reshape(2, 12, 5), text, cls[:, None]], axis=1))
+
+        unpacked = unpack(packed, ps, 'b * c')
+        for original, result in zip([image, text, cls], unpacked):
+            np.testing.assert_array_equal(result, original)
+            self.assertTrue(np.shares_memory(result, packed))
+
+    def test_non_contiguous_inputs_and_out(self):
+        a = np.random.randn(4, 3).T
+        b = np.random.randn(3, 2, 2)[:, ::-1]
+        out = np.empty((3, 8))
+        packed, ps = pack([a, b], 'h *', out=out)
+        self.assertIs(packed, out)
+        np.testing.assert_array_equal(packed, np.concatenate([a, b.reshape(3, 4)], axis=1))
+        with self.assertRaises(ValueError):
+            pack([a, b], 'h *', out=np.empty((3, 6)))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pack([np.ones((2, 3))], 'b c')
+        with self.assertRaises(ValueError):
+            pack([np.ones((2, 3))], 'b * * c')
+        with self.assertRaises(ValueError):
+            pack([np.ones((2, 3)), np.ones((3, 3))], 'b *')
+        with self.assertRaises(ValueError):
+            pack([np.ones(2)], 'b * c')
+        with self.assertRaises(ValueError):
+            unpack(np.ones((2, 5)), [(2,), (2,)], 'b *')
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def test_counts_and_stages(self):
+        array = np.random.randn(2, 3, 4)
+        with profile() as collected:
+            rearrange(array, 'a b c -> a (b c)')
+            rearrange(array, 'a b c -> a (b c)')
+            rearrange(array, 'a b c -> c b a', copy=True)
+            self.assertIs(stats(), collected)
+
+        views = collected['a b c -> a (b c)']
+        self.assertEqual((views.calls, views.cache_misses, views.cache_hits), (2, 1, 1))
+        self.assertEqual((views.views, views.copies, views.bytes_moved), (2, 0, 0))
+        self.assertGreater(views.stage_ns['parse'], 0)
+        self.assertGreater(views.stage_ns['execute'], 0)
+
+        copies = collected['a b c -> c b a']
+        self.assertEqual((copies.copies, copies.bytes_moved), (1, array.nbytes))
+        self.assertIn('a b c -> c b a', collected.report())
+        self.assertIs(stats(), collected)
+
+    def test_compiled_patterns(self):
+        to_last = compile_pattern('b c h w -> b h w c')
+        with profile() as collected:
+            to_last(np.ones((1, 2, 3, 4)))
+            to_last(np.ones((5, 2, 3, 4)))
+        # The plan was compiled by compile_pattern, before profiling started
+        record = collected['b c h w -> b h w c']
+        self.assertEqual((record.calls, record.cache_misses, record.cache_hits, record.views), (2, 0, 2, 2))
+        self.assertGreater(record.stage_ns['shapes'], 0)
+
+    def test_disabled_outside_block(self):
+        with profile() as collected:
+            pass
+        rearrange(np.ones((2, 3)), 'a b -> b a')
+        self.assertEqual(collected.patterns, {})
+
+    def test_threads_profile_independently(self):
+        array = np.ones((2, 3))
+
+        def worker(axes, commands, replies):
+            commands.get()
+            with profile() as collected:
+                replies.put(None)
+                commands.get()
+                rearrange(array, f'{axes[0]} {axes[1]} -> {axes[1]} {axes[0]}')
+            rearrange(array, f'{axes[0]} {axes[1]} -> ({axes[0]} {axes[1]})')
+            replies.put(collected)
+
+        # Blocks opened in order a, b and closed in either order must only see their own thread's calls
+        for closing in (('a', 'b'), ('b', 'a')):
+            channels = {name: (queue.Queue(), queue.Queue()) for name in 'ab'}
+            threads = [threading.Thread(target=worker, args=(axes, *channels[axes[0]])) for axes in ('ab', 'bc')]
+            with profile() as outer:
+                for thread in threads:
+                    thread.start()
+                for name in 'ab':
+                    channels[name][0].put('open')
+                    channels[name][1].get()
+                collected = {}
+                for name in closing:
+                    channels[name][0].put('close')
+                    collected[name] = channels[name][1].get()
+                for thread in threads:
+                    thread.join()
+            self.assertEqual(list(collected['a'].patterns), ['a b -> b a'])
+            self.assertEqual(list(collected['b'].patterns), ['b c -> c b'])
+            self.assertEqual(outer.patterns, {})
+
+    def test_async_offloaded_copy(self):
+        array = np.random.randn(64, 64, 64)
+
+        async def main():
+            with profile() as collected:
+                await arearrange(array, 'a b c -> c b a', copy=True)
+            return collected
+
+        record = asyncio.run(main())['a b c -> c b a']
+        self.assertEqual((record.calls, record.copies), (1, 1))
+
+class TestPatternParser(unittest.TestCase):
+    def test_ast(self):
+        parsed = parse_pattern('b (h 1 p) 1 ... (c 1) -> b ... (h p c) 1')
+        self.assertEqual([term.kind for term in parsed.input.terms], [AXIS, GROUP, SINGLETON, ELLIPSIS, AXIS])
+        self.assertEqual(parsed.input.terms[1].axes, ('h', 'p'))
+        self.assertEqual(parsed.input.terms[1].position, 2)
+        self.assertEqual(parsed.input.terms[4].position, 17)
+        self.assertEqual(parsed.input.tokens, ('b', '(h p)', '1', '...', 'c'))
+        self.assertEqual(parsed.input.axes, ('b', 'h', 'p', 'c'))
+        self.assertTrue(parsed.output.has_ellipsis)
+        self.assertEqual(parsed.output.text, 'b ... (h p c) 1')
+        self.assertIs(parse_pattern('b (h 1 p) 1 ... (c 1) -> b ... (h p c) 1'), parsed)
+
+    def test_error_positions(self):
+        cases = [
+            ('a b -> a b c', 11),
+            ('a b_1 -> a b_1', 2),
+            ('b ((h w) c) -> b h w c', 3),
+            ('b (h w -> b h w', 2),
+            ('b h) -> b h', 3),
+            ('b (... h) -> b h', 3),
+            ('... a ... -> a', 6),
+            ('a a -> a', 2),
+            ('a b -> b a -> a', 11),
+            ('a b', 3),
+            ('a $ -> a', 2),
+        ]
+        for pattern, position in cases:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(PatternError) as caught:
+                    rearrange(np.ones((2, 3)), pattern)
+                self.assertEqual(caught.exception.position, position)
+                self.assertIsInstance(caught.exception, ValueError)
+                self.assertIn(' ' * position + '^', str(caught.exception))
+
+    def test_anonymous_axes(self):
+        with self.assertRaises(PatternError):
+            parse_pattern('a (b 2) -> a b')
+        parsed = parse_pattern('a (b 2) (c 2) -> a b c', anonymous=True)
+        self.assertEqual(parsed.input.axes, ('a', 'b', '2', 'c', '2'))
+
+    def test_pack_patterns(self):
+        side = parse_pack_pattern('b * c')
+        self.assertEqual(side.tokens, ('b', '*', 'c'))
+        for pattern in ['b c', 'b * * c', 'b (h w) *', 'b * -> c', '... *']:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(PatternError):
+                    parse_pack_pattern(pattern)
+
+class TestPlans(unittest.TestCase):
+    def test_one_plan_for_all_batch_sizes(self):
+        plan = build_plan('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', 4, p1=2, p2=3)
+        for batch in (1, 2, 7):
+            recipe = plan.recipe((batch, 4, 6, 5))
+            self.assertEqual(recipe.init_shape, (batch, 2, 2, 2, 3, 5))
+            self.assertEqual(recipe.axes, (0, 1, 3, 2, 4, 5))
+            self.assertEqual(recipe.final_shape, (batch, 4, 30))
+
+    def test_ellipsis_and_singletons(self):
+        plan = build_plan('a 1 ... b -> b ... 1 a', 5)
+        recipe = plan.recipe((2, 1, 3, 4, 5))
+        self.assertEqual(recipe.init_shape, (2, 3, 4, 5))
+        self.assertEqual(recipe.final_shape, (5, 3, 4, 1, 2))
+        array = np.random.randn(2, 1, 3, 4, 5)
+        expected = array[:, 0].transpose(3, 1, 2, 0)[:, :, :, None]
+        np.testing.assert_array_equal(rearrange(array, 'a 1 ... b -> b ... 1 a'), expected)
+
+    def test_shape_errors(self):
+        plan = build_plan('b (h w) 1 -> b h w', 3, w=4)
+        with self.assertRaises(ValueError):
+            plan.recipe((2, 6, 1))
+        with self.assertRaises(ValueError):
+            plan.recipe((2, 8, 3))
+        with self.assertRaises(ValueError):
+            plan.recipe((2, 8))
+        self.assertEqual(plan.recipe((2, 8, 1)).final_shape, (2, 2, 4))
+
+    def test_plan_errors(self):
+        with self.assertRaises(ValueError):
+            build_plan('(a b) c -> a b c', 2)
+        with self.assertRaises(ValueError):
+            build_plan('a b c -> c b a', 2)
+        with self.assertRaises(ValueError):
+            build_plan('a b ... -> ... b a', 1)
+
+    def test_compiled_plans_per_rank(self):
+        flatten = compile_pattern('... h w -> ... (h w)')
+        self.assertEqual(flatten(np.ones((2, 3, 4))).shape, (2, 12))
+        self.assertEqual(flatten(np.ones((2, 5, 3, 4))).shape, (2, 5, 12))
+        self.assertEqual(flatten.plan(4).ndim, 4)
+        self.assertIs(flatten.plan(3), flatten.plan(3))
+
+class TestPlanFiles(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def tearDown(self):
+        clear_cache()
+
+    def test_round_trip(self):
+        array = np.random.randn(2, 12, 18, 6)
+        pattern = 'b (h h1) (w w1) c -> b h w (c h1 w1)'
+        expected = rearrange(array, pattern, h1=3, w=6)
+        rearrange(np.ones((2, 3, 4)), '... c -> c ...')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plans.json')
+            self.assertEqual(save_plans(path), 2)
+            clear_cache()
+            self.assertEqual(load_plans(path), 2)
+
+        # The first calls after loading are cache hits, whatever the batch size
+        np.testing.assert_array_equal(rearrange(array, pattern, h1=3, w=6), expected)
+        rearrange(np.ones((5, 3, 4)), '... c -> c ...')
+        info = cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 0))
+
+    def test_numpy_integer_sizes(self):
+        array = np.random.randn(6, 2)
+        rearrange(array, '(h w) c -> h w c', h=np.int64(3))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plans.json')
+            self.assertEqual(save_plans(path), 1)
+            clear_cache()
+            self.assertEqual(load_plans(path), 1)
+        rearrange(array, '(h w) c -> h w c', h=3)
+        self.assertEqual(cache_info().misses, 0)
+        with self.assertRaises(ValueError):
+            rearrange(array, '(h w) c -> h w c', h=1.5)
+
+    def test_failed_save_keeps_previous_file(self):
+        rearrange(np.ones((2, 3)), 'a b -> b a')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plans.json')
+            save_plans(path)
+            with open(path) as f:
+                saved = f.read()
+            with mock.patch('json.dump', side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    save_plans(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), saved)
+            self.assertEqual(os.listdir(tmp), ['plans.json'])
+
+    def test_invalid_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plans.json')
+            rearrange(np.ones((2, 3)), 'a b -> b a')
+            save_plans(path)
+            with open(path) as f:
+                data = json.load(f)
+
+            for broken in ({**data, 'version': 0}, {'plans': []},
+                           {**data, 'plans': [{'kwargs': {}, 'plan': {**data['plans'][0]['plan'], 'axes': [0, 0]}}]}):
+                with open(path, 'w') as f:
+                    json.dump(broken, f)
+                clear_cache()
+                with self.assertRaises(ValueError):
+                    load_plans(path)
+                self.assertEqual(cache_info().currsize, 0)
+
+    def test_pickle(self):
+        patchify = compile_pattern('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', p1=2, p2=2)
+        restored = pickle.loads(pickle.dumps(patchify))
+        images = np.random.randn(3, 4, 6, 2)
+        np.testing.assert_array_equal(restored(images), patchify(images))
+        self.assertEqual(restored.plan(4).as_dict(), patchify.plan(4).as_dict())
+        plan = pickle.loads(pickle.dumps(patchify.plan(4)))
+        self.assertEqual(plan.recipe(images.shape), patchify.recipe(images.shape))
+
+class _RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+class TestAsync(unittest.TestCase):
+    def tearDown(self):
+        set_executor(None)
+
+    def test_views_stay_on_the_loop(self):
+        array = np.random.randn(256, 64, 32)
+        executor = _RecordingExecutor()
+        set_executor(executor)
+        result = asyncio.run(arearrange(array, 'b h w -> b (h w)'))
+        self.assertTrue(np.shares_memory(result, array))
+        self.assertEqual(executor.submitted, 0)
+
+    def test_copies_are_offloaded(self):
+        array = np.random.randn(256, 64, 32)
+        executor = _RecordingExecutor()
+        result = asyncio.run(arearrange(array, 'b h w -> w b h', copy=True, executor=executor))
+        np.testing.assert_array_equal(result, rearrange(array, 'b h w -> w b h'))
+        self.assertEqual(executor.submitted, 1)
+
+        # Small copies are not worth a thread hand-off
+        asyncio.run(arearrange(np.ones((4, 5)), 'a b -> b a', copy=True, executor=executor))
+        self.assertEqual(executor.submitted, 1)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(arearrange(np.ones((256, 64, 32)), 'b h w -> (w b) h', copy=False))
+        with self.assertRaises(TypeError):
+            set_executor(4)
+
+class TestIngestion(unittest.TestCase):
+    def test_buffers_are_not_copied(self):
+        values = pyarray.array('f', range(12))
+        result = rearrange(values, '(h w) -> w h', w=4)
+        self.assertEqual((result.shape, result.dtype), ((4, 3), np.float32))
+        values[1] = -1
+        self.assertEqual(result[1, 0], -1)
+
+        matrix = np.arange(6).reshape(2, 3)
+        np.testing.assert_array_equal(rearrange(memoryview(matrix), 'a b -> b a'), matrix.T)
+
+    def test_raw_bytes_are_viewed_as_dtype(self):
+        shared = bytearray(np.arange(6, dtype=np.float64).tobytes())
+        result = rearrange(shared, '(a b) -> b a', a=2, dtype=np.float64)
+        np.testing.assert_array_equal(result, np.arange(6.0).reshape(2, 3).T)
+        result[0, 0] = 42
+        self.assertEqual(np.frombuffer(shared, dtype=np.float64)[0], 42)
+
+    def test_array_interface_and_dlpack(self):
+        source = np.arange(12).reshape(3, 4)
+
+        class Interface:
+            __array_interface__ = source.__array_interface__
+
+        class DLPack:
+            def __dlpack__(self, **kwargs):
+                return source.__dlpack__(**kwargs)
+
+            def __dlpack_device__(self):
+                return source.__dlpack_device__()
+
+        for wrapped in (Interface(), DLPack()):
+            result = rearrange(wrapped, 'a b -> b a')
+            self.assertTrue(np.shares_memory(result, source))
+            np.testing.assert_array_equal(result, source.T)
+
+    def test_list_dtype(self):
+        result = rearrange([[1, 2], [3, 4]], 'a b -> b a', dtype=np.float32)
+        self.assertEqual(result.dtype, np.float32)
+        with self.assertRaises(TypeError):
+            rearrange(object(), 'a -> a')
+
+class TestFusedCast(unittest.TestCase):
+    def test_matches_astype(self):
+        array = np.random.rand(4, 6, 8, 3).astype(np.float32)
+        for pattern in ('b h w c -> b (c h w)', 'b h w c -> b c h w', 'b h w c -> (b h) w c'):
+            for engine in ('numpy', 'tiled'):
+                with self.subTest(pattern=pattern, engine=engine):
+                    result = rearrange(array, pattern, dtype=np.float16, engine=engine)
+                    self.assertEqual(result.dtype, np.float16)
+                    self.assertFalse(np.shares_memory(result, array))
+                    np.testing.assert_array_equal(result, rearrange(array, pattern).astype(np.float16))
+
+    def test_unsafe_casts_and_layout(self):
+        array = np.random.rand(3, 4) * 10
+        result = rearrange(array, 'a b -> b a', dtype=np.int32, order='C')
+        self.assertTrue(result.flags.c_contiguous)
+        np.testing.assert_array_equal(result, array.T.astype(np.int32))
+        # Same dtype: no cast, the view is kept
+        self.assertTrue(np.shares_memory(rearrange(array, 'a b -> b a', dtype=np.float64), array))
+
+    def test_out_and_copy(self):
+        array = np.random.rand(3, 4)
+        out = np.empty((4, 3), dtype=np.float32)
+        self.assertIs(rearrange(array, 'a b -> b a', out=out, dtype=np.float32), out)
+        np.testing.assert_array_equal(out, array.T.astype(np.float32))
+        with self.assertRaises(ValueError):
+            rearrange(array, 'a b -> b a', out=out, dtype=np.float16)
+        with self.assertRaises(ValueError):
+            rearrange(array, 'a b -> b a', copy=False, dtype=np.float32)
+        self.assertEqual(compile_pattern('a b -> (b a)')(array, dtype=np.float32).dtype, np.float32)
+
+class TestInverse(unittest.TestCase):
+    def test_round_trips(self):
+        cases = [
+            ('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', (2, 8, 12, 3), {'p1': 4, 'p2': 4}),
+            ('a 1 ... b -> b ... 1 a', (2, 1, 3, 4, 5), {}),
+            ('b (c 1) h w -> 1 (b h) w c', (2, 3, 4, 5), {}),
+            ('... (h w) -> w ... h', (2, 3, 12), {'w': 3}),
+        ]
+        for pattern, shape, kwargs in cases:
+            with self.subTest(pattern=pattern):
+                forward = compile_pattern(pattern, **kwargs)
+                array = np.random.randn(*shape)
+                result = forward(array)
+                backward = forward.inverse()
+                np.testing.assert_array_equal(backward(result), array)
+                # Same plan as compiling the reverse pattern by hand with the bound sizes
+                ndim = result.ndim
+                self.assertEqual(backward.plan(ndim).as_dict(),
+                                 build_plan(backward.pattern, ndim, **backward.kwargs).as_dict())
+
+    def test_bound_sizes(self):
+        patchify = compile_pattern('b (h p1) (w p2) c -> b (h w) (p1 p2 c)', p1=4, p2=4)
+        unpatchify = patchify.inverse((2, 8, 12, 3))
+        self.assertEqual(unpatchify.pattern, 'b (h w) (p1 p2 c) -> b (h p1) (w p2) c')
+        self.assertEqual(unpatchify.kwargs, {'h': 2, 'p1': 4, 'w': 3, 'p2': 4, 'c': 3})
+
+        # The batch axis stays free, the merged ones are checked
+        patches = np.random.randn(7, 6, 48)
+        with profile() as collected:
+            self.assertEqual(unpatchify(patches).shape, (7, 8, 12, 3))
+        record = collected[unpatchify.pattern]
+        self.assertEqual((record.cache_misses, record.stage_ns['parse']), (0, 0))
+        with self.assertRaises(ValueError):
+            unpatchify(np.random.randn(7, 6, 40))
+
+    def test_requires_a_shape(self):
+        with self.assertRaises(ValueError):
+            compile_pattern('a b -> b a').inverse()
+        with self.assertRaises(ValueError):
+            compile_pattern('a (b c) -> a b c', c=2).inverse((2, 3))
+
 unittest.main(argv=[''], verbosity=2, exit=False)
\ No newline at end of file